@@ -0,0 +1,53 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Import time of bqtools in fresh interpreters, and the heavy dependencies the
+# import pulled in. Exits with 1 if the import got slower than --max-seconds
+# or imported one of them, so it can guard CI against regressions.
+#
+#   python -m benchmarks.bench_import --repeat 10 --max-seconds 0.2
+
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'google.cloud.bigquery', 'google.api_core', 'dateutil']
+
+_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import fourtytwo.bqtools
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'modules': [m for m in %r if m in sys.modules]}))
+''' % (HEAVY_MODULES,)
+
+
+def import_once():
+    output = subprocess.check_output([sys.executable, '-c', _SCRIPT])
+    return json.loads(output.decode('utf8').splitlines()[-1])
+
+def run(repeat):
+    results = [import_once() for n in range(repeat)]
+    seconds = [result['seconds'] for result in results]
+    return {
+        'repeat': repeat,
+        'min': min(seconds),
+        'median': statistics.median(seconds),
+        'modules': sorted(set(m for result in results for m in result['modules'])),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=None)
+    args = parser.parse_args(argv)
+
+    result = run(args.repeat)
+    print('import fourtytwo.bqtools: {min:.4f}s min, {median:.4f}s median'.format(**result))
+    if result['modules']:
+        print('heavy modules imported: {}'.format(', '.join(result['modules'])))
+    if result['modules'] or (args.max_seconds is not None and result['min'] > args.max_seconds):
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import argparse
+import concurrent.futures
+import random
+import time
+
+from fourtytwo import bqtools
+
+# Converts a wide table of strings serially and with thread and process pools.
+#
+#   python -m benchmarks.bench_parallel --columns 100 --rows 100000 --workers 8
+
+FIELD_TYPES = ['INTEGER', 'FLOAT', 'STRING', 'BOOLEAN', 'DATETIME']
+
+
+def make_data(n_columns, n_rows, seed=42):
+    rng = random.Random(seed)
+    schema, data = [], []
+    for index in range(n_columns):
+        field_type = FIELD_TYPES[index % len(FIELD_TYPES)]
+        schema.append({'name': 'column_{}'.format(index), 'field_type': field_type})
+        if field_type == 'DATETIME':
+            column = ['2020-01-{:02d} 10:{:02d}:00'.format(rng.randint(1, 28), rng.randint(0, 59)) for n in range(n_rows)]
+        elif field_type == 'BOOLEAN':
+            column = [rng.choice(['true', 'false', None]) for n in range(n_rows)]
+        else:
+            column = [str(rng.randint(0, 1000000)) for n in range(n_rows)]
+        data.append(column)
+    return schema, data
+
+def run(schema, data, executor=None):
+    start = time.perf_counter()
+    table = bqtools.BQTable(schema=schema, data=data, executor=executor)
+    return time.perf_counter() - start, table
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--columns', type=int, default=50)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    schema, data = make_data(args.columns, args.rows)
+    serial_seconds, expected = run(schema, data)
+    print('serial: {:.2f}s'.format(serial_seconds))
+
+    executors = [
+        ('threads', concurrent.futures.ThreadPoolExecutor),
+        ('processes', concurrent.futures.ProcessPoolExecutor),
+    ]
+    for name, executor_class in executors:
+        with executor_class(max_workers=args.workers) as executor:
+            seconds, table = run(schema, data, executor)
+        assert table.rows() == expected.rows()
+        print('{} ({} workers): {:.2f}s, speedup {:.1f}x'.format(
+            name, args.workers, seconds, serial_seconds / seconds
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import timeit
+
+from google.cloud import bigquery
+
+from fourtytwo import bqtools
+
+# Row <-> column pivots against the value-by-value implementation they replaced.
+#
+#   python -m benchmarks.bench_pivot --columns 20 --rows 100000
+
+
+def reference_rows_to_columns(rows, schema):
+    schema_len = len(schema)
+    columns = [[] for n in range(schema_len)]
+    for row in rows:
+        if isinstance(row, dict):
+            row = [row.get(field.name) for field in schema]
+
+        row_len = len(row)
+        if row_len > schema_len:
+            row = row[:schema_len]
+        elif row_len < schema_len:
+            row += [None] * (schema_len - row_len)
+
+        for index, value in enumerate(row):
+            columns[index].append(value)
+    return columns
+
+def reference_columns_to_rows(columns, schema, n=None, row_type='list'):
+    if not columns:
+        return []
+    rows = []
+    max_col_len = max([len(c) for c in columns])
+    if n:
+        max_col_len = min(n, max_col_len)
+
+    if row_type == 'list':
+        for index in range(max_col_len):
+            row = [c[index] for c in columns]
+            rows.append(row)
+    elif row_type == 'dict':
+        for index in range(max_col_len):
+            row = {s.name: columns[n][index] for n, s in enumerate(schema)}
+            rows.append(row)
+    return rows
+
+def make_data(n_columns, n_rows):
+    schema = [bigquery.SchemaField('column_{}'.format(n), 'INTEGER') for n in range(n_columns)]
+    columns = [list(range(n_rows)) for n in range(n_columns)]
+    return schema, columns
+
+def compare(name, reference, optimized, repeat):
+    reference_seconds = min(timeit.repeat(reference, number=1, repeat=repeat))
+    optimized_seconds = min(timeit.repeat(optimized, number=1, repeat=repeat))
+    print('{:<24} {:8.3f}s {:8.3f}s {:6.1f}x'.format(
+        name, reference_seconds, optimized_seconds, reference_seconds / optimized_seconds
+    ))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--columns', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    schema, columns = make_data(args.columns, args.rows)
+    list_rows = bqtools._columns_to_rows(columns, schema)
+    dict_rows = bqtools._columns_to_rows(columns, schema, row_type='dict')
+
+    print('{:<24} {:>9} {:>9} {:>7}'.format('', 'reference', 'bqtools', 'speedup'))
+    compare(
+        'list rows -> columns',
+        lambda: reference_rows_to_columns(list_rows, schema),
+        lambda: bqtools._rows_to_columns(list_rows, schema),
+        args.repeat
+    )
+    compare(
+        'dict rows -> columns',
+        lambda: reference_rows_to_columns(dict_rows, schema),
+        lambda: bqtools._rows_to_columns(dict_rows, schema),
+        args.repeat
+    )
+    compare(
+        'columns -> list rows',
+        lambda: reference_columns_to_rows(columns, schema),
+        lambda: bqtools._columns_to_rows(columns, schema),
+        args.repeat
+    )
+    compare(
+        'columns -> dict rows',
+        lambda: reference_columns_to_rows(columns, schema, row_type='dict'),
+        lambda: bqtools._columns_to_rows(columns, schema, row_type='dict'),
+        args.repeat
+    )
+
+if __name__ == '__main__':
+    main()
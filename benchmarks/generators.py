@@ -0,0 +1,112 @@
+import datetime
+import decimal
+import random
+
+# Synthetic tables for the benchmarks. Rows are generated from a fixed seed,
+# so every run converts, pivots and serializes the same values.
+
+KINDS = ['scalar', 'datetime', 'nested', 'repeated']
+
+SCHEMAS = {
+    'scalar': [
+        {'name': 'integer', 'field_type': 'INTEGER'},
+        {'name': 'float', 'field_type': 'FLOAT'},
+        {'name': 'numeric', 'field_type': 'NUMERIC'},
+        {'name': 'boolean', 'field_type': 'BOOLEAN'},
+        {'name': 'string', 'field_type': 'STRING'},
+        {'name': 'bytes', 'field_type': 'BYTES'},
+    ],
+    'datetime': [
+        {'name': 'date', 'field_type': 'DATE'},
+        {'name': 'datetime', 'field_type': 'DATETIME'},
+        {'name': 'time', 'field_type': 'TIME'},
+        {'name': 'timestamp', 'field_type': 'TIMESTAMP'},
+    ],
+    'nested': [
+        {'name': 'id', 'field_type': 'INTEGER'},
+        {'name': 'record', 'field_type': 'RECORD', 'fields': [
+            {'name': 'integer', 'field_type': 'INTEGER'},
+            {'name': 'string', 'field_type': 'STRING'},
+            {'name': 'inner', 'field_type': 'RECORD', 'fields': [
+                {'name': 'float', 'field_type': 'FLOAT'},
+                {'name': 'date', 'field_type': 'DATE'}]}]},
+    ],
+    'repeated': [
+        {'name': 'id', 'field_type': 'INTEGER'},
+        {'name': 'tags', 'field_type': 'STRING', 'mode': 'REPEATED'},
+        {'name': 'scores', 'field_type': 'FLOAT', 'mode': 'REPEATED'},
+        {'name': 'events', 'field_type': 'RECORD', 'mode': 'REPEATED', 'fields': [
+            {'name': 'name', 'field_type': 'STRING'},
+            {'name': 'timestamp', 'field_type': 'TIMESTAMP'}]},
+    ],
+}
+
+# share of NULL values in nullable fields
+NULL_RATE = 0.05
+
+
+def _maybe_null(rng, value):
+    return None if rng.random() < NULL_RATE else value
+
+def _scalar_row(rng, n):
+    return [
+        _maybe_null(rng, rng.randint(-10**9, 10**9)),
+        _maybe_null(rng, rng.random() * 1000),
+        _maybe_null(rng, decimal.Decimal(rng.randint(0, 10**6)) / 100),
+        _maybe_null(rng, rng.random() < 0.5),
+        _maybe_null(rng, 'value_{}'.format(rng.randint(0, 10**6))),
+        _maybe_null(rng, rng.getrandbits(64).to_bytes(8, 'little')),
+    ]
+
+def _datetime_row(rng, n):
+    # datetimes as strings, the way they arrive from files and APIs
+    dt_value = datetime.datetime(2020, 1, 1) + datetime.timedelta(seconds=rng.randint(0, 10**8))
+    return [
+        _maybe_null(rng, dt_value.date().isoformat()),
+        _maybe_null(rng, dt_value.isoformat(' ')),
+        _maybe_null(rng, dt_value.time().isoformat()),
+        _maybe_null(rng, dt_value.isoformat(' ') + '+00:00'),
+    ]
+
+def _nested_row(rng, n):
+    return [
+        n,
+        _maybe_null(rng, {
+            'integer': rng.randint(0, 1000),
+            'string': 'value_{}'.format(rng.randint(0, 1000)),
+            'inner': _maybe_null(rng, {
+                'float': rng.random(),
+                'date': datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randint(0, 1000)),
+            }),
+        }),
+    ]
+
+def _repeated_row(rng, n):
+    return [
+        n,
+        ['tag_{}'.format(rng.randint(0, 100)) for i in range(rng.randint(0, 5))],
+        [rng.random() for i in range(rng.randint(0, 5))],
+        [
+            {'name': 'event_{}'.format(i), 'timestamp': 1577836800.0 + rng.randint(0, 10**8)}
+            for i in range(rng.randint(0, 3))
+        ],
+    ]
+
+_ROW_GENERATORS = {
+    'scalar': _scalar_row,
+    'datetime': _datetime_row,
+    'nested': _nested_row,
+    'repeated': _repeated_row,
+}
+
+def make_schema(kind):
+    return [dict(field) for field in SCHEMAS[kind]]
+
+def make_rows(kind, n_rows, seed=42):
+    rng = random.Random(seed)
+    make_row = _ROW_GENERATORS[kind]
+    return [make_row(rng, n) for n in range(n_rows)]
+
+def make_columns(kind, n_rows, seed=42):
+    rows = make_rows(kind, n_rows, seed)
+    return [list(column) for column in zip(*rows)] if rows else [[] for field in SCHEMAS[kind]]
@@ -0,0 +1,196 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from fourtytwo import bqtools
+from fourtytwo.bqtools import conversions
+from fourtytwo.bqtools.testing import FakeClient
+
+from benchmarks import generators
+
+# Benchmarks of the bqtools hot paths on synthetic tables.
+#
+#   python -m benchmarks.run --sizes 1000 100000 --output results.json
+#   python -m benchmarks.run --compare results.json --output new_results.json
+#
+# Results are written as JSON: one entry per benchmark, kind and size with
+# the min, median and mean seconds of all repeats.
+
+DEFAULT_SIZES = [1000, 10000]
+TABLE_REF = 'project.dataset.table'
+# uploads are read in large chunks, like the resumable uploads of the client
+READ_SIZE = 8 * 1024 * 1024
+
+BENCHMARKS = []
+
+
+def benchmark(kinds=generators.KINDS):
+    def register(function):
+        BENCHMARKS.append((function.__name__.replace('bench_', ''), kinds, function))
+        return function
+    return register
+
+
+class Case(object):
+    def __init__(self, kind, n_rows, tmpdir):
+        self.kind = kind
+        self.n_rows = n_rows
+        self.tmpdir = tmpdir
+        self.schema = generators.make_schema(kind)
+        self.rows = generators.make_rows(kind, n_rows)
+        self.columns = generators.make_columns(kind, n_rows)
+        self.table = bqtools.BQTable(schema=self.schema, data=self.columns)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, '{}_{}_{}'.format(self.kind, self.n_rows, name))
+
+# Each benchmark yields (name, function) pairs, only the function is timed.
+
+@benchmark()
+def bench_convert(case):
+    for field, column in zip(case.table.schema, case.columns):
+        name = 'convert.{}'.format(field.field_type)
+        if field.mode == 'REPEATED':
+            name += '.REPEATED'
+        yield name, lambda column=column, field=field: conversions.convert(
+            column, field.field_type, field.mode, field.fields)
+
+@benchmark()
+def bench_construct(case):
+    yield 'construct', lambda: bqtools.BQTable(schema=case.schema, data=case.columns)
+    yield 'construct.typed', lambda: bqtools.BQTable(schema=case.schema, data=case.columns, storage='typed')
+
+@benchmark()
+def bench_append(case):
+    def append():
+        table = bqtools.BQTable(schema=case.schema)
+        table.append(case.rows)
+    yield 'append', append
+
+@benchmark()
+def bench_rows(case):
+    yield 'rows', lambda: case.table.rows()
+    yield 'rows.dict', lambda: case.table.rows(row_type='dict')
+
+@benchmark()
+def bench_to_df(case):
+    yield 'to_df', lambda: case.table.to_df()
+
+@benchmark()
+def bench_save_load(case):
+    filename = case.path('table.bqt')
+    yield 'save', lambda: case.table.save(filename)
+    yield 'load', lambda: bqtools.load(filename)
+
+@benchmark(kinds=['scalar', 'datetime'])
+def bench_to_csv(case):
+    yield 'to_csv', lambda: case.table.to_csv(case.path('table.csv'))
+
+@benchmark()
+def bench_to_json(case):
+    yield 'to_json', lambda: case.table.to_json(case.path('table.json'))
+
+@benchmark()
+def bench_to_bq(case):
+    yield 'to_bq', lambda: case.table.to_bq(TABLE_REF, client=FakeClient(read_size=READ_SIZE))
+
+@benchmark()
+def bench_read_bq(case):
+    client = FakeClient()
+    client.add_table(TABLE_REF, case.table.schema, case.table.rows())
+    bqtools.cache.schema_cache.invalidate()
+    yield 'read_bq', lambda: bqtools.read_bq(TABLE_REF, client=client, limit=None, page_size=10000)
+
+
+def time_function(function, repeat):
+    function()  # warm up caches and lazy imports
+    seconds = []
+    for n in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+def run(kinds, sizes, repeat, name_filter=None, progress=None):
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for kind in kinds:
+            for n_rows in sizes:
+                case = Case(kind, n_rows, tmpdir)
+                for group, group_kinds, function in BENCHMARKS:
+                    if kind not in group_kinds:
+                        continue
+                    for name, benchmark_function in function(case):
+                        if name_filter and name_filter not in name:
+                            continue
+                        seconds = time_function(benchmark_function, repeat)
+                        result = {
+                            'benchmark': name,
+                            'kind': kind,
+                            'rows': n_rows,
+                            'repeat': repeat,
+                            'min': min(seconds),
+                            'median': statistics.median(seconds),
+                            'mean': statistics.mean(seconds),
+                            'rows_per_second': n_rows / min(seconds) if min(seconds) else None,
+                        }
+                        results.append(result)
+                        if progress:
+                            progress(result)
+    return results
+
+def result_key(result):
+    return (result['benchmark'], result['kind'], result['rows'])
+
+def compare(results, baseline):
+    # ratio > 1: slower than the baseline
+    baseline = {result_key(result): result for result in baseline['results']}
+    comparison = []
+    for result in results:
+        base = baseline.get(result_key(result))
+        if base and base['min']:
+            comparison.append(dict(result, baseline_min=base['min'], ratio=result['min'] / base['min']))
+    return comparison
+
+def print_result(result):
+    line = '{benchmark:<24} {kind:<10} {rows:>9} {min:10.4f}s {median:10.4f}s'.format(**result)
+    if 'ratio' in result:
+        line += ' {:6.2f}x'.format(result['ratio'])
+    print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--kinds', nargs='+', default=generators.KINDS, choices=generators.KINDS)
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--filter', default=None, help='only run benchmarks whose name contains this')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None, help='results file of an earlier run')
+    args = parser.parse_args(argv)
+
+    results = run(args.kinds, args.sizes, args.repeat, args.filter,
+                  progress=None if args.compare else print_result)
+    output = {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'args': vars(args),
+        'results': results,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            output['comparison'] = compare(results, json.load(f))
+        for result in output['comparison']:
+            print_result(result)
+
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+
+if __name__ == '__main__':
+    main()
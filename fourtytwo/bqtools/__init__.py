@@ -1,128 +1,311 @@
-import csv
-import os
-import logging
+import concurrent.futures
+import datetime
 import gzip
+import itertools
+import operator
 import pickle
-import random
 import time
-import json
-
-import pandas as pd
-from google.cloud import bigquery
-import google.api_core
+import uuid
 
+from fourtytwo.bqtools import arrow
+from fourtytwo.bqtools import cache
 from fourtytwo.bqtools import conversions
+from fourtytwo.bqtools import fileformat
+from fourtytwo.bqtools import frames
+from fourtytwo.bqtools import inference
+from fourtytwo.bqtools import instrumentation
+from fourtytwo.bqtools import queries
+from fourtytwo.bqtools import schemas
+from fourtytwo.bqtools import storage
+from fourtytwo.bqtools import streams
+
+STORAGE_TYPES = ['list', 'typed']
+SOURCE_FORMATS = ['csv', 'json', 'parquet']
+
+
+def load(filename, columns=None, rows=None, workers=None, storage=None, mmap=False, allow_pickle=False):
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools.load', filename)
+
+    if not fileformat.is_bqt_file(filename):
+        # unpickling runs code from the file, only for trusted files of older versions
+        if not allow_pickle:
+            raise ValueError(
+                '{} is not a .bqt file. Files saved by older versions of bqtools are '
+                'pickles, load trusted ones with allow_pickle=True'.format(filename)
+            )
+        return _load_pickle(filename)
+
+    if mmap:
+        if rows:
+            raise ValueError('rows cannot be selected from a memory-mapped table, slice its columns instead')
+        schema, data, metadata = fileformat.map_table(filename, columns=columns)
+        table = BQTable(schema=schema, storage=storage or metadata.get('storage', 'list'))
+        # mapped columns are read-only and decoded on access, they are not copied into storage
+        object.__setattr__(table, '_data', data)
+        return table
+
+    schema, data, metadata = fileformat.read_table(filename, columns=columns, rows=rows, workers=workers)
+    table = BQTable(schema=schema, storage=storage or metadata.get('storage', 'list'))
+    table._set_converted_data(data)
+    return table
+
+def infer_schema(data, sample=inference.SAMPLE_SIZE, parse_strings=True, required=False):
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools.infer_schema')
+
+    return schemas.to_bigquery_schema(
+        inference.infer_schema(data, sample=sample, parse_strings=parse_strings, required=required)
+    )
+
+def from_arrow(arrow_table, storage='list'):
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools.from_arrow')
+
+    schema, data = arrow.from_arrow(arrow_table)
+    return BQTable(schema=schema, data=data, storage=storage)
 
-DEBUG = False
-if DEBUG:
-    logging.basicConfig(level=logging.DEBUG)
+def from_parquet(filename, columns=None, storage='list'):
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools.from_parquet', filename)
 
+    schema, data = arrow.read_parquet(filename, columns=columns)
+    return BQTable(schema=schema, data=data, storage=storage)
 
-def load(filename):
-    if DEBUG:
-        logging.debug('bqtools.load({})'.format(filename))
+def from_df(df, storage='list', executor=None):
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools.from_df')
 
+    with instrumentation.timer('from_df', rows=len(df)):
+        schema, data = frames.from_df(df, storage_type=storage, executor=executor)
+    table = BQTable(schema=schema, storage=storage, executor=executor)
+    table._set_converted_data(data)
+    return table
+
+def _load_pickle(filename):
+    # tables saved before bqtools used its columnar file format
     with gzip.open(filename, 'rb') as f:
         table_data = pickle.load(f)    
 
-    table = BQTable(schema=table_data['schema'], data=table_data['data'])
+    typed = any(isinstance(column, storage.Column) for column in table_data['data'])
+    table = BQTable(
+        schema=table_data['schema'],
+        data=table_data['data'],
+        storage='typed' if typed else 'list'
+    )
     return table
 
-def read_bq(table_ref, credentials=None, limit=10, schema_only=False, columns=None, max_retries=3):
-    if DEBUG:
-        logging.debug('bqtools.read_bq({})'.format(table_ref))
+def read_bq(table_ref, credentials=None, limit=10, schema_only=False, columns=None, max_retries=3,
+            client=None, page_size=None, storage='list', filters=None, date_range=None, sample=None):
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools.read_bq', table_ref)
     
-    table = BQTable()
+    client = _get_client(credentials, client)
+    table_ref = _table_ref_string(table_ref)
+
+    if schema_only:
+        table = BQTable(storage=storage)
+        table.schema = _project_schema(cache.schema_cache.get(client, table_ref), columns)
+        return table
+
+    # the schema comes with the result, it only has the selected columns.
+    # the result is typed page by page, raw rows are never held for the whole table
+    query = queries.Query(table_ref, columns, filters, date_range, sample, limit)
+    row_iterator = _run_query(client, query, max_retries, page_size)
+    table = BQTable(schema=row_iterator.schema, storage=storage)
+    for rows in _result_pages(row_iterator):
+        table.append(rows)
+    return table
 
-    if credentials:
-        client = bigquery.Client.from_service_account_json(credentials)
-    else:
-        client = bigquery.Client()
-    
-    if isinstance(table_ref, bigquery.TableReference):
+def read_bq_chunks(table_ref, credentials=None, limit=None, columns=None, max_retries=3,
+                   client=None, page_size=10000, storage='list', filters=None, date_range=None, sample=None):
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools.read_bq_chunks', table_ref)
+
+    client = _get_client(credentials, client)
+    table_ref = _table_ref_string(table_ref)
+    query = queries.Query(table_ref, columns, filters, date_range, sample, limit)
+    row_iterator = _run_query(client, query, max_retries, page_size)
+
+    for rows in _result_pages(row_iterator):
+        table = BQTable(schema=row_iterator.schema, storage=storage)
+        table.append(rows)
+        yield table
+
+def read_csv(source, schema, delimiter=',', skip_leading_rows=0, compression=None,
+             chunk_size=10000, storage='list', executor=None):
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools.read_csv', source)
+
+    # rows are parsed chunk by chunk and appended to the columns as they are converted
+    table = BQTable(schema=schema, storage=storage, executor=executor)
+    with instrumentation.timer('read_csv'), streams.open_input(source, compression) as f:
+        for rows in streams.csv_row_chunks(f, delimiter, skip_leading_rows, chunk_size):
+            columns = _rows_to_columns(rows, table.schema)
+            table._append_columns(streams.decode_columns(columns, table.schema, streams.csv_value_decoder))
+    return table
+
+def read_json(source, schema, compression=None, chunk_size=10000, storage='list', executor=None):
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools.read_json', source)
+
+    table = BQTable(schema=schema, storage=storage, executor=executor)
+    with instrumentation.timer('read_json'), streams.open_input(source, compression) as f:
+        for rows in streams.json_row_chunks(f, chunk_size):
+            columns = _rows_to_columns(rows, table.schema)
+            table._append_columns(streams.decode_columns(columns, table.schema, streams.json_value_decoder))
+    return table
+
+def _get_client(credentials=None, client=None):
+    if client is not None:
+        return client
+    return cache.get_client(credentials)
+
+def _table_ref_string(table_ref):
+    if not isinstance(table_ref, str):
+        # a bigquery.TableReference
         table_ref = '{}.{}.{}'.format(
             table_ref.project, table_ref.dataset_id, table_ref.table_id)
-    
-    schema = client.get_table(bigquery.Table(table_ref=table_ref)).schema
-    table.schema = schema
-
-    if not schema_only:
-        selector = ','.join(columns) if columns else '*'
-        query = 'select {} from `{}`'.format(selector, table_ref)
-        if limit:
-            query += ' limit {}'.format(limit)
-        job = client.query(query)
-
-        job_success = False
-        retries = 0
-        while retries < max_retries and not job_success:
-            try:
-                row_iterator = job.result()
-                job_success = True
-            except google.api_core.exceptions.InternalServerError:
-                time.sleep((retries + 1)**2)
-                retries += 1
-                
-        rows = [row.values() for row in row_iterator]
-        columns = _rows_to_columns(rows=rows, schema=schema)
-        table.data = columns
-    return table
+    return table_ref
+
+def _project_schema(schema, columns=None):
+    if not columns:
+        return schema
+    fields = {field.name: field for field in schema}
+    for name in columns:
+        if name not in fields:
+            raise ValueError('{} is not a field of the table'.format(name))
+    return [fields[name] for name in columns]
+
+def _run_query(client, query, max_retries=3, page_size=None):
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools._run_query', query.sql)
+
+    job = client.query(query.sql, job_config=query.job_config())
+    return _wait_for_job(job, max_retries, page_size=page_size)
+
+def _result_pages(row_iterator):
+    for page in row_iterator.pages:
+        yield [list(row.values()) for row in page]
 
 def _rows_to_columns(rows, schema):
-    if DEBUG:
-        logging.debug('bqtools._rows_to_columns()')
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools._rows_to_columns')
 
-    schema_len = len(schema)
-    columns = [[] for n in range(schema_len)]
-    for row in rows:
-        if isinstance(row, dict):
-            row = [row.get(field.name) for field in schema]
-        
-        row_len = len(row)
-        if row_len > schema_len:
-            row = row[:schema_len]
-        elif row_len < schema_len:
-            row += [None] * (schema_len - row_len)
+    rows = rows if isinstance(rows, list) else list(rows)
+    with instrumentation.timer('rows_to_columns', rows=len(rows)):
+        return _pivot_rows(rows, schema)
 
-        for index, value in enumerate(row):
-            columns[index].append(value)
-    return columns
+def _pivot_rows(rows, schema):
+    schema_len = len(schema)
+    field_names = [field.name for field in schema]
+    if not rows:
+        return [[] for name in field_names]
 
-def _columns_to_rows(columns, schema, n=None, row_type='list'):
-    if DEBUG:
-        logging.debug('bqtools._columns_to_rows()')
-    
+    if all(isinstance(row, dict) for row in rows):
+        if schema_len > 1:
+            try:
+                # all fields present in all rows: one C-level lookup per row
+                return [list(column) for column in zip(*map(operator.itemgetter(*field_names), rows))]
+            except KeyError:
+                pass
+        return [[row.get(name) for row in rows] for name in field_names]
+
+    rows = [_fit_row(row, schema_len, field_names) for row in rows]
+    return [list(column) for column in zip(*rows)]
+
+def _fit_row(row, schema_len, field_names):
+    # rows shorter than the schema are padded with None, longer ones truncated
+    if isinstance(row, dict):
+        return [row.get(name) for name in field_names]
+    row_len = len(row)
+    if row_len == schema_len:
+        return row
+    elif row_len > schema_len:
+        return row[:schema_len]
+    return list(row) + [None] * (schema_len - row_len)
+
+def _iter_rows(columns, schema, n=None, row_type='list'):
     if not columns:
-        return []
-    rows = []
-    max_col_len = max([len(c) for c in columns])
+        return iter([])
+    rows = zip(*columns)
     if n:
-        max_col_len = min(n, max_col_len)
+        rows = itertools.islice(rows, n)
+    if row_type == 'dict':
+        field_names = [field.name for field in schema]
+        return (dict(zip(field_names, row)) for row in rows)
+    return map(list, rows)
 
-    if row_type == 'list':
-        for index in range(max_col_len):
-            row = [c[index] for c in columns]
-            rows.append(row)
-    elif row_type == 'dict':
-        for index in range(max_col_len):
-            row = {s.name: columns[n][index] for n, s in enumerate(schema)}
-            rows.append(row)
-    return rows
+def _columns_to_rows(columns, schema, n=None, row_type='list'):
+    if instrumentation.enabled:
+        instrumentation.trace('bqtools._columns_to_rows')
+
+    with instrumentation.timer('columns_to_rows', row_type=row_type):
+        return list(_iter_rows(columns, schema, n=n, row_type=row_type))
+
+def _iter_row_chunks(columns, schema, chunk_size=10000, row_type='list'):
+    n_rows = len(columns[0]) if columns else 0
+    field_names = [field.name for field in schema]
+    for start in range(0, n_rows, chunk_size):
+        rows = zip(*[column[start:start + chunk_size] for column in columns])
+        if row_type == 'dict':
+            yield [dict(zip(field_names, row)) for row in rows]
+        else:
+            yield list(rows)
 
 
+def _wait_for_job(job, max_retries=3, **kwargs):
+    from google.api_core import exceptions
+
+    job_success = False
+    retries = 0
+    result = None
+    with instrumentation.timer('wait_for_job', job_id=getattr(job, 'job_id', None)):
+        while retries < max_retries and not job_success:
+            try:
+                result = job.result(**kwargs)
+                job_success = True
+            except exceptions.InternalServerError:
+                instrumentation.count('job_retries')
+                time.sleep((retries + 1)**2)
+                retries += 1
+    return result
+
+def _get_table_or_none(client, table_ref):
+    from google.api_core import exceptions
+
+    try:
+        return client.get_table(table_ref)
+    except exceptions.NotFound:
+        return None
+
+def _field_signature(field):
+    return (field.field_type.upper(), field.mode.upper(), field.fields)
+
 
 class BQTable(object):
-    def __init__(self, schema=None, data=None):
-        if DEBUG:
-            logging.debug('bqtools.BQTable.__init__')
+    def __init__(self, schema=None, data=None, storage='list', lazy=False, executor=None):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.__init__')
         
+        if storage not in STORAGE_TYPES:
+            raise ValueError('storage must be one of {}'.format(STORAGE_TYPES))
+        object.__setattr__(self, '_storage', storage)
+        # lazy tables convert columns when they are first read, until then
+        # the names of the unconverted columns are kept in _dirty
+        object.__setattr__(self, '_lazy', lazy)
+        object.__setattr__(self, '_dirty', set())
+        # optional concurrent.futures executor for type conversions
+        object.__setattr__(self, '_executor', executor)
+        if data and not schema:
+            schema = inference.infer_schema(data)
         self.schema = schema if schema else []
         self.data = data if data else []
     
     def __repr__(self):
-        schema_shape = len(self.schema)
-        if len(self.data) > 0:
-            data_shape = (len(self.data[0]), len(self.data))
+        schema_shape = len(self._schema)
+        if self._data:
+            data_shape = (len(self._data[0]), len(self._data))
         else:
             data_shape = (0,)
         return '<bqtools.BQTable(shape_schema={}, shape_data={})>'.format(schema_shape, data_shape)
@@ -130,11 +313,11 @@ class BQTable(object):
     def __eq__(self, other):
         if not isinstance(other, BQTable):
             raise TypeError('other must be of type BQTable')
-        return self.schema == other.schema and self.data == other.data
+        return self._schema == other._schema and self.data == other.data
     
     def __setattr__(self, name, value):
-        if DEBUG:
-            logging.debug('bqtools.BQTable.set {}'.format(name))
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.set', name)
 
         if name == 'schema':
             self._set_schema(value)
@@ -142,200 +325,345 @@ class BQTable(object):
             self._set_data(value)
 
     def __getattr__(self, name):
-        if DEBUG:
-            logging.debug('bqtools.BQTable.get {}'.format(name))
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.get', name)
         
         if name == 'schema':
-            return self._schema
+            # bigquery.SchemaFields are only made when the schema is read
+            if self._bigquery_schema is None:
+                object.__setattr__(self, '_bigquery_schema', schemas.to_bigquery_schema(self._schema))
+            # a copy, changes to the list must not change the cache
+            return list(self._bigquery_schema)
         elif name == 'data':
+            if self._dirty:
+                self.validate()
             return self._data
 
     def _set_schema(self, schema):
-        if DEBUG:
-            logging.debug('bqtools.BQTable._set_schema()')
-
-        new_schema = []
-        for field in schema:
-            if isinstance(field, bigquery.SchemaField):
-                new_schema.append(field)
-            elif isinstance(field, (tuple, list)):
-                new_schema.append(bigquery.SchemaField(*field))
-            elif isinstance(field, dict):
-                if field['field_type']== 'RECORD':
-                    if field.get('fields', None):
-                        fields = []
-                        for f in field['fields']:
-                            fields.append(bigquery.SchemaField(**f))
-                        field['fields'] = fields
-                    else:
-                        raise ValueError('fields not specified for field type RECORD')
-                new_schema.append(bigquery.SchemaField(**field))
-        
-        if self.schema and new_schema and new_schema != self.schema:
-            data_shape = (len(self.data[0]), len(self.data))
-            if len(new_schema) > len(self.schema) and data_shape[0] > 0:
-                # append None-columns for new fields to the end of schema and data
-                # then order columns
-                data = self.data.copy()
-                tmp_schema = self.schema.copy()
-                for field in new_schema:
-                    if field not in tmp_schema:
-                        data.append([None] * data_shape[0])
-                        tmp_schema.append(field)
-                data = self._move_columns(new_schema=new_schema, data=data, schema=tmp_schema)
-            else:
-                data = self._move_columns(new_schema=new_schema)
-        else:
-            data = self.data
-        
-        if data:
-            data = self._typecheck(schema=new_schema, data=data)
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable._set_schema')
+
+        self._check_writable()
+        new_schema = [schemas.to_field(field) for field in schema]
+        new_schema = [field for field in new_schema if field is not None]
+
+        if not self._data:
             object.__setattr__(self, '_schema', new_schema)
-            object.__setattr__(self, '_data', data)
-        else:
+            object.__setattr__(self, '_bigquery_schema', None)
+            return
+
+        if not self._schema:
+            # data without a schema yet, columns are matched by position
             object.__setattr__(self, '_schema', new_schema)
+            object.__setattr__(self, '_bigquery_schema', None)
+            self._set_data(self._data)
+            return
+
+        # columns are matched by name, only fields that are new or whose
+        # type or mode changed are converted (on the next read, if lazy)
+        data, changed = self._align_columns(new_schema)
+        if self._lazy:
+            new_field_names = set(field.name for field in new_schema)
+            object.__setattr__(self, '_dirty', changed | (self._dirty & new_field_names))
+            # typed columns of changed fields hold values of the old type, the
+            # raw values appended until the next read go into lists
+            for index, field in enumerate(new_schema):
+                if field.name in changed:
+                    data[index] = list(data[index])
+        elif changed:
+            indexes = [index for index, field in enumerate(new_schema) if field.name in changed]
+            fields = [new_schema[index] for index in indexes]
+            columns = self._typecheck(schema=fields, data=[data[index] for index in indexes])
+            for index, column in zip(indexes, self._store(schema=fields, data=columns)):
+                data[index] = column
+        object.__setattr__(self, '_schema', new_schema)
+        object.__setattr__(self, '_bigquery_schema', None)
+        object.__setattr__(self, '_data', data)
 
     def _set_data(self, data):
-        if DEBUG:
-            logging.debug('bqtools.BQTable._set_data()')
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable._set_data')
         
+        self._check_writable()
+        dirty = set()
         if data and isinstance(data, list):
             if isinstance(data[0], dict):
-                data = _rows_to_columns(rows=data, schema=self.schema)
-            data = self._typecheck(data=data)
+                data = _rows_to_columns(rows=data, schema=self._schema)
+            if self._lazy:
+                # copies, appends must not change the caller's lists
+                data = [list(column) for column in data]
+                dirty = set(field.name for field in self._schema)
+            else:
+                data = self._typecheck(data=data)
+                data = self._store(schema=self._schema, data=data)
+        object.__setattr__(self, '_dirty', dirty)
         object.__setattr__(self, '_data', data)
     
-    def _move_columns(self, new_schema, data=None, schema=None):
-        if DEBUG:
-            logging.debug('bqtools.BQTable._move_columns()')
-        
-        if isinstance(schema, list):
-            old_field_names = [field.name for field in schema]
-        else:
-            old_field_names = [field.name for field in self.schema]
-        new_field_names = [field.name for field in new_schema]
-        column_order = [old_field_names.index(name) for name in new_field_names]
-        if isinstance(data, list):
-            return [data[index] for index in column_order]
-        else:
-            return [self.data[index] for index in column_order]
+    def _check_writable(self):
+        # checked before anything is changed, so a failed change leaves the table as it was
+        if self._data and any(isinstance(column, fileformat.MappedColumn) for column in self._data):
+            raise TypeError('memory-mapped tables are read-only, load them without mmap=True to change them')
+
+    def _set_converted_data(self, data):
+        # for columns that are already converted, e.g. decoded from a file
+        object.__setattr__(self, '_data', self._store(schema=self._schema, data=data))
+
+    def _align_columns(self, new_schema):
+        # matches the columns to new_schema by name. new nullable fields get
+        # columns of nulls, fields that are new otherwise or whose type or mode
+        # changed are returned as changed.
+        old_fields = {field.name: (field, column) for field, column in zip(self._schema, self._data)}
+        n_rows = len(self._data[0])
+        data = []
+        changed = set()
+        for field in new_schema:
+            if field.name in old_fields:
+                old_field, column = old_fields[field.name]
+                if _field_signature(old_field) != _field_signature(field):
+                    changed.add(field.name)
+            elif field.mode.upper() == 'REPEATED':
+                column = [[] for n in range(n_rows)]
+            elif field.mode.upper() == 'NULLABLE':
+                column = conversions.convert([None], field.field_type, field.mode, field.fields) * n_rows
+                column = self._store(schema=[field], data=[column])[0]
+            else:
+                column = [None] * n_rows
+                changed.add(field.name)
+            data.append(column)
+        return data, changed
 
     def _rename_columns(self, mapping):
-        if DEBUG:
-            logging.debug('bqtools.BQTable._rename_columns()')
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable._rename_columns')
 
-        new_schema = [field for field in self.schema]
-        old_field_names = [field.name for field in self.schema]
+        # renames only change the schema, the columns stay where they are
+        field_indexes = {field.name: index for index, field in enumerate(self._schema)}
+        new_schema = list(self._schema)
         for old_field_name, new_field_name in mapping.items():
-            index = old_field_names.index(old_field_name)
+            if old_field_name not in field_indexes:
+                raise ValueError('{} is not a field of the table'.format(old_field_name))
+            index = field_indexes[old_field_name]
             field = new_schema[index]
-            new_schema[index] = bigquery.SchemaField(
-                name=new_field_name,
-                field_type=field.field_type,
+            new_schema[index] = schemas.SchemaField(
+                new_field_name,
+                field.field_type,
                 mode=field.mode,
                 description=field.description,
                 fields=field.fields
             )
-        self.schema = new_schema
+        object.__setattr__(self, '_dirty', set(mapping.get(name, name) for name in self._dirty))
+        object.__setattr__(self, '_schema', new_schema)
+        object.__setattr__(self, '_bigquery_schema', None)
 
-    def _typecheck(self, schema=None, data=None):
-        if DEBUG:
-            logging.debug('bqtools.BQTable._typecheck()')
+    def _typecheck(self, schema=None, data=None, executor=None):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable._typecheck')
         
-        schema = schema if schema else self.schema
+        schema = schema if schema else self._schema
         data = data if data else self.data
+        executor = executor if executor is not None else self._executor
         
         if schema and data:
-            typechecked_columns = []
-            for index, field in enumerate(schema):
-                typechecked_columns.append(
-                    conversions.convert(
-                        data[index], 
-                        field.field_type,
-                        field.mode,
-                        field.fields
-                    )
+            # columns are independent, with an executor they are converted in parallel
+            with instrumentation.timer('typecheck', columns=len(schema), rows=len(data[0])):
+                return conversions.convert_columns(
+                    data[:len(schema)],
+                    [(field.field_type, field.mode, field.fields) for field in schema],
+                    executor=executor,
+                    names=[field.name for field in schema]
                 )
-            return typechecked_columns
         else:
             return data
 
+    def validate(self, columns=None):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.validate')
+
+        # converts the columns of a lazy table that have not been read yet,
+        # conversion errors are raised here instead of on the next read
+        names = self._dirty if columns is None else self._dirty & set(columns)
+        if not names:
+            return
+        indexes = [index for index, field in enumerate(self._schema) if field.name in names]
+        fields = [self._schema[index] for index in indexes]
+        converted = self._typecheck(schema=fields, data=[self._data[index] for index in indexes])
+        for index, column in zip(indexes, self._store(schema=fields, data=converted)):
+            self._data[index] = column
+        object.__setattr__(self, '_dirty', self._dirty - names)
+
+    def column(self, name):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.column', name)
+
+        field_names = [field.name for field in self._schema]
+        if name not in field_names:
+            raise KeyError(name)
+        self.validate(columns=[name])
+        return self._data[field_names.index(name)]
+
+    def _store(self, schema, data):
+        # typed storage keeps scalar columns in compact buffers, see bqtools.storage
+        if self._storage == 'typed':
+            return [
+                storage.make_column(column, field.field_type, field.mode)
+                for column, field in zip(data, schema)
+            ]
+        return data
+
     def rename(self, columns):
-        if DEBUG:
-            logging.debug('bqtools.BQTable.rename()')
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.rename')
 
         self._rename_columns(mapping=columns)
     
     def append(self, rows):
-        append_columns = _rows_to_columns(rows=rows, schema=self.schema)
-        data = self.data if self.data else [[] for n in range(len(self.schema))]
-        for index in range(len(data)):
-            data[index] += append_columns[index]
-        self.data = data
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.append')
+
+        self._append_columns(_rows_to_columns(rows=rows, schema=self._schema))
+
+    def _append_columns(self, append_columns):
+        # only the new rows are type checked, existing columns are extended in place
+        # (unconverted columns of lazy tables are extended as they are)
+        self._check_writable()
+        if self._lazy and not self._data:
+            object.__setattr__(self, '_dirty', set(field.name for field in self._schema))
+            object.__setattr__(self, '_data', append_columns)
+            return
+
+        indexes = [index for index, field in enumerate(self._schema) if field.name not in self._dirty]
+        if indexes:
+            converted = self._typecheck(
+                schema=[self._schema[index] for index in indexes],
+                data=[append_columns[index] for index in indexes]
+            )
+            for index, column in zip(indexes, converted):
+                append_columns[index] = column
+        if self._data:
+            # typed columns are extended from the converted lists, a value that
+            # does not fit the buffer (e.g. an integer outside of int64) turns
+            # the column into a list instead of leaving the table ragged
+            for index, append_column in enumerate(append_columns):
+                column = self._data[index]
+                if isinstance(column, storage.Column):
+                    try:
+                        column.extend(append_column)
+                        continue
+                    except (OverflowError, TypeError):
+                        column = list(column)
+                        self._data[index] = column
+                column.extend(append_column)
+        else:
+            append_columns = self._store(schema=self._schema, data=append_columns)
+            object.__setattr__(self, '_data', append_columns)
 
     def rows(self, n=None, row_type='list'):
-        if DEBUG:
-            logging.debug('bqtools.BQTable.rows()')
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.rows')
 
         rows = _columns_to_rows(
             columns=self.data, 
-            schema=self.schema, 
+            schema=self._schema, 
             n=n, 
             row_type=row_type
         )
         return rows
     
-    def save(self, filename):
-        if DEBUG:
-            logging.debug('bqtools.BQTable.save()')
-        
-        schema_dicts = [
-            {
-                'name': field.name,
-                'field_type': field.field_type,
-                'mode': field.mode,
-                'description': field.description,
-                'fields': field.fields,
-            } for field in self.schema
-        ]
-        
-        table_data = {
-            'schema': schema_dicts,
-            'data': self.data,
-        }
+    def iter_rows(self, n=None, row_type='list'):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.iter_rows')
+
+        # like rows(), without building the list of all rows
+        return _iter_rows(columns=self.data, schema=self._schema, n=n, row_type=row_type)
+
+    def save(self, filename, row_group_size=100000, compression='zlib'):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.save')
         
-        with gzip.open(filename, 'wb') as f:
-            pickle.dump(table_data, f, pickle.HIGHEST_PROTOCOL)
+        fileformat.write_table(
+            filename,
+            schema=self._schema,
+            columns=self.data,
+            row_group_size=row_group_size,
+            codec=compression,
+            metadata={'storage': self._storage}
+        )
     
     def to_df(self):
-        if DEBUG:
-            logging.debug('bqtools.BQTable.to_df()')
-        
-        data = {field.name: self.data[index] for index, field in enumerate(self.schema)}
-        return pd.DataFrame(data)
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.to_df')
 
-    def to_bq(self, table_ref, credentials=None, mode='append', max_retries=3):
-        if DEBUG:
-            logging.debug('bqtools.BQTable.to_bq({})'.format(table_ref))
+        with instrumentation.timer('to_df', rows=len(self._data[0]) if self._data else 0):
+            return frames.to_df(self._schema, self.data)
+
+    @classmethod
+    def from_df(cls, df, storage='list', executor=None):
+        return from_df(df, storage=storage, executor=executor)
+
+    def to_arrow(self):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.to_arrow')
+
+        return arrow.to_arrow(self._schema, self.data)
+
+    def to_parquet(self, filename, compression='snappy', row_group_size=None):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.to_parquet', filename)
+
+        arrow.write_parquet(filename, self._schema, self.data, compression=compression, row_group_size=row_group_size)
+
+    def to_bq(self, table_ref, credentials=None, mode='append', max_retries=3,
+              client=None, compression=None, chunk_size=10000,
+              load_chunk_size=None, max_workers=4, progress=None, source_format=None):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.to_bq', table_ref)
+
+        from google.cloud import bigquery
+        client = _get_client(credentials, client)
 
-        if credentials:
-            client = bigquery.Client.from_service_account_json(credentials)
-        else:
-            client = bigquery.Client()
-        
         if isinstance(table_ref, str):
             table_ref = bigquery.TableReference.from_string(table_ref)
 
-        # upload_source_format = 'json' if any([f._field_type in ['STRUCT', 'RECORD'] or f._mode=='REPEATED' for f in self.schema]) else 'csv'
-        # upload_source_format = 'json' if any([f._mode=='REPEATED' for f in self.schema]) else 'csv'
-        upload_source_format = 'csv'
-        if upload_source_format == 'csv':
-            tmpfile = 'tmpfile_{}.csv'.format(random.randint(1000,9999))
-            self.to_csv(tmpfile, delimiter=',')
-        elif upload_source_format == 'json':
-            tmpfile = 'tmpfile_{}.json'.format(random.randint(1000,9999))
-            self.to_json(tmpfile)
-        
+        # CSV cannot hold nested or repeated values, those tables are loaded as JSON
+        if source_format:
+            upload_source_format = source_format
+        elif any(f.field_type in ['STRUCT', 'RECORD'] or f.mode == 'REPEATED' for f in self._schema):
+            upload_source_format = 'json'
+        else:
+            upload_source_format = 'csv'
+        if upload_source_format not in SOURCE_FORMATS:
+            raise ValueError('source_format must be one of {}'.format(SOURCE_FORMATS))
+        write_disposition = 'WRITE_TRUNCATE' if mode =='overwrite' else 'WRITE_APPEND'
+
+        if load_chunk_size:
+            load_job = self._to_bq_parallel(
+                client=client,
+                table_ref=table_ref,
+                mode=mode,
+                upload_source_format=upload_source_format,
+                max_retries=max_retries,
+                compression=compression,
+                chunk_size=chunk_size,
+                load_chunk_size=load_chunk_size,
+                max_workers=max_workers,
+                progress=progress
+            )
+        else:
+            with self._upload_stream(upload_source_format, compression, chunk_size) as stream:
+                load_job = client.load_table_from_file(
+                    stream,
+                    table_ref,
+                    job_config=self._load_job_config(upload_source_format, write_disposition),
+                    job_id_prefix='load_table_from_file'
+                )
+                _wait_for_job(load_job, max_retries)
+
+        # the load may have created the table or changed its schema
+        cache.schema_cache.invalidate(_table_ref_string(table_ref))
+        return load_job
+
+    def _load_job_config(self, upload_source_format, write_disposition):
+        from google.cloud import bigquery
         job_config = bigquery.LoadJobConfig()
         job_config.autodetect = False
         job_config.create_disposition = 'CREATE_IF_NEEDED'
@@ -343,40 +671,132 @@ class BQTable(object):
             job_config.source_format = bigquery.SourceFormat.CSV
         elif upload_source_format == 'json':
             job_config.source_format = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
-        job_config.write_disposition = 'WRITE_TRUNCATE' if mode =='overwrite' else 'WRITE_APPEND'
+        elif upload_source_format == 'parquet':
+            job_config.source_format = bigquery.SourceFormat.PARQUET
+            job_config.parquet_options = bigquery.ParquetOptions()
+            job_config.parquet_options.enable_list_inference = True
+        job_config.write_disposition = write_disposition
         job_config.schema = self.schema
-
-        with open(tmpfile, 'rb') as csv_file:
-            load_job = client.load_table_from_file(
-                csv_file,
-                table_ref,
-                job_config=job_config,
-                job_id_prefix='load_table_from_file'
+        return job_config
+
+    def _upload_stream(self, upload_source_format, compression, chunk_size, start=0, end=None):
+        # rows are encoded chunk by chunk while the load job reads the stream
+        columns = self.data
+        if start or end is not None:
+            columns = [column[start:end] for column in columns]
+        if upload_source_format == 'parquet':
+            # parquet compresses its pages itself, compression picks the codec
+            return arrow.parquet_stream(self._schema, columns, compression=compression or 'snappy')
+        if upload_source_format == 'csv':
+            row_chunks = _iter_row_chunks(columns, self._schema, chunk_size=chunk_size)
+            chunks = streams.csv_chunks(row_chunks, self._schema, delimiter=',')
+        elif upload_source_format == 'json':
+            row_chunks = _iter_row_chunks(columns, self._schema, chunk_size=chunk_size)
+            chunks = streams.json_chunks(row_chunks, self._schema)
+        return streams.ChunkStream(chunks, compression=compression)
+
+    def _to_bq_parallel(self, client, table_ref, mode, upload_source_format, max_retries,
+                        compression, chunk_size, load_chunk_size, max_workers, progress):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable._to_bq_parallel', table_ref)
+
+        from google.cloud import bigquery
+
+        # for overwrites the chunks are loaded into a staging table first,
+        # which then replaces the destination table with a single copy job
+        if mode == 'overwrite':
+            load_ref = bigquery.TableReference(
+                bigquery.DatasetReference(table_ref.project, table_ref.dataset_id),
+                '{}_staging_{}'.format(table_ref.table_id, uuid.uuid4().hex)
             )
+            staging_table = bigquery.Table(load_ref, schema=self.schema)
+            staging_table.expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+            # copies that truncate a table need the same partitioning and clustering
+            destination = _get_table_or_none(client, table_ref)
+            if destination is not None:
+                staging_table.time_partitioning = destination.time_partitioning
+                staging_table.range_partitioning = destination.range_partitioning
+                staging_table.clustering_fields = destination.clustering_fields
+            client.create_table(staging_table)
+        else:
+            load_ref = table_ref
 
-            job_success = False
-            retries = 0
-            while retries < max_retries and not job_success:
-                try:
-                    load_job.result()
-                    job_success = True
-                except google.api_core.exceptions.InternalServerError:
-                    time.sleep((retries + 1)**2)
-                    retries += 1
-
-        os.remove(tmpfile)
-
-        return load_job
-
-    def to_csv(self, filename, delimiter=','):
-        if DEBUG:
-            logging.debug('bqtools.BQTable.to_csv({})'.format(filename))
+        n_rows = len(self.data[0]) if self.data else 0
+        row_ranges = [
+            (start, min(start + load_chunk_size, n_rows))
+            for start in range(0, n_rows, load_chunk_size)
+        ]
 
-        with open(filename, 'w', newline='') as csv_file:
-            writer = csv.writer(csv_file, delimiter=delimiter)
-            writer.writerows(self.rows())
+        def load_chunk(chunk):
+            index, (start, end) = chunk
+            start_time = time.time()
+            with self._upload_stream(upload_source_format, compression, chunk_size, start, end) as stream:
+                load_job = client.load_table_from_file(
+                    stream,
+                    load_ref,
+                    job_config=self._load_job_config(upload_source_format, 'WRITE_APPEND'),
+                    job_id_prefix='load_table_from_file'
+                )
+                _wait_for_job(load_job, max_retries)
+                n_bytes = stream.tell()
+            seconds = time.time() - start_time
+            stats = {
+                'chunk': index,
+                'chunks': len(row_ranges),
+                'rows': end - start,
+                'bytes': n_bytes,
+                'seconds': seconds,
+                'rows_per_second': (end - start) / seconds if seconds else None,
+                'bytes_per_second': n_bytes / seconds if seconds else None,
+                'job': load_job,
+            }
+            if instrumentation.enabled:
+                instrumentation.trace('bqtools.BQTable._to_bq_parallel.chunk', stats)
+            if progress:
+                # called from the worker threads
+                progress(stats)
+            return load_job
+
+        # like to_bq without chunks, a single job is returned: the copy job of
+        # overwrites or the last load job. the load jobs of all chunks are
+        # passed to progress.
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                jobs = list(executor.map(load_chunk, enumerate(row_ranges)))
+
+            if mode == 'overwrite':
+                copy_config = bigquery.CopyJobConfig()
+                copy_config.create_disposition = 'CREATE_IF_NEEDED'
+                copy_config.write_disposition = 'WRITE_TRUNCATE'
+                copy_job = client.copy_table(load_ref, table_ref, job_config=copy_config)
+                _wait_for_job(copy_job, max_retries)
+                jobs.append(copy_job)
+        finally:
+            if mode == 'overwrite':
+                client.delete_table(load_ref, not_found_ok=True)
+        return jobs[-1] if jobs else None
+
+    def to_csv(self, filename, delimiter=',', compression=None, chunk_size=10000, progress=None):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.to_csv', filename)
+
+        # rows are encoded and written chunk by chunk, filename may also be a binary file-like object
+        return streams.write_chunks(
+            filename,
+            _iter_row_chunks(self.data, self._schema, chunk_size=chunk_size),
+            streams.csv_chunk_encoder(self._schema, delimiter=delimiter),
+            compression=compression,
+            progress=progress
+        )
 
-    def to_json(self, filename):
-        with open(filename, 'w') as obj:
-            for r in self.rows(row_type='dict'):
-                obj.write(json.dumps(r)+'\n')
\ No newline at end of file
+    def to_json(self, filename, compression=None, chunk_size=10000, progress=None):
+        if instrumentation.enabled:
+            instrumentation.trace('bqtools.BQTable.to_json', filename)
+
+        return streams.write_chunks(
+            filename,
+            _iter_row_chunks(self.data, self._schema, chunk_size=chunk_size),
+            streams.json_chunk_encoder(self._schema),
+            compression=compression,
+            progress=progress
+        )
\ No newline at end of file
@@ -0,0 +1,181 @@
+import decimal
+import io
+import math
+
+from fourtytwo.bqtools import instrumentation
+from fourtytwo.bqtools import schemas
+from fourtytwo.bqtools import storage
+
+# pyarrow is optional, it is only imported when a table is converted
+
+NUMERIC_SCALE = decimal.Decimal('1e-9')
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('pyarrow is required for Arrow and Parquet support: pip install bqtools[parquet]')
+    return pyarrow
+
+def _import_parquet():
+    _import_pyarrow()
+    import pyarrow.parquet
+    return pyarrow.parquet
+
+def _arrow_value_type(field):
+    pa = _import_pyarrow()
+    field_type = field.field_type.upper()
+    if field_type in ['RECORD', 'STRUCT']:
+        return pa.struct([to_arrow_field(f) for f in field.fields])
+    types = {
+        'INTEGER': pa.int64(),
+        'FLOAT': pa.float64(),
+        'NUMERIC': pa.decimal128(38, 9),
+        'BOOLEAN': pa.bool_(),
+        'STRING': pa.string(),
+        'BYTES': pa.binary(),
+        'DATE': pa.date32(),
+        'DATETIME': pa.timestamp('us'),
+        'TIME': pa.time64('us'),
+        'TIMESTAMP': pa.timestamp('us', tz='UTC'),
+    }
+    if field_type not in types:
+        raise NotImplementedError('{} cannot be converted to Arrow yet.'.format(field_type))
+    return types[field_type]
+
+def to_arrow_field(field):
+    pa = _import_pyarrow()
+    arrow_type = _arrow_value_type(field)
+    if field.mode.upper() == 'REPEATED':
+        # BigQuery arrays cannot hold NULL, neither can the list
+        return pa.field(field.name, pa.list_(pa.field('item', arrow_type, nullable=False)), nullable=False)
+    return pa.field(field.name, arrow_type, nullable=field.mode.upper() != 'REQUIRED')
+
+def to_arrow_schema(schema):
+    pa = _import_pyarrow()
+    return pa.schema([to_arrow_field(field) for field in schema])
+
+def _from_arrow_type(arrow_type):
+    pa = _import_pyarrow()
+    types = pa.types
+    if types.is_struct(arrow_type):
+        return 'RECORD', [from_arrow_field(arrow_type.field(i)) for i in range(arrow_type.num_fields)]
+    elif types.is_integer(arrow_type):
+        return 'INTEGER', ()
+    elif types.is_floating(arrow_type):
+        return 'FLOAT', ()
+    elif types.is_decimal(arrow_type):
+        return 'NUMERIC', ()
+    elif types.is_boolean(arrow_type):
+        return 'BOOLEAN', ()
+    elif types.is_string(arrow_type) or types.is_large_string(arrow_type):
+        return 'STRING', ()
+    elif types.is_binary(arrow_type) or types.is_large_binary(arrow_type) or types.is_fixed_size_binary(arrow_type):
+        return 'BYTES', ()
+    elif types.is_date(arrow_type):
+        return 'DATE', ()
+    elif types.is_timestamp(arrow_type):
+        return ('TIMESTAMP' if arrow_type.tz else 'DATETIME'), ()
+    elif types.is_time(arrow_type):
+        return 'TIME', ()
+    raise NotImplementedError('Arrow type {} has no BigQuery equivalent.'.format(arrow_type))
+
+def from_arrow_field(arrow_field):
+    pa = _import_pyarrow()
+    arrow_type = arrow_field.type
+    if pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type):
+        field_type, fields = _from_arrow_type(arrow_type.value_type)
+        mode = 'REPEATED'
+    else:
+        field_type, fields = _from_arrow_type(arrow_type)
+        mode = 'NULLABLE' if arrow_field.nullable else 'REQUIRED'
+    return schemas.SchemaField(arrow_field.name, field_type, mode=mode, fields=fields)
+
+def from_arrow_schema(arrow_schema):
+    return [from_arrow_field(arrow_field) for arrow_field in arrow_schema]
+
+# -- values
+
+def _timestamp_to_micros(value):
+    if value is None or math.isnan(value):
+        return None
+    return int(round(value * 1000000))
+
+def _float_to_arrow(value):
+    return None if value is None or math.isnan(value) else value
+
+def _numeric_to_arrow(value):
+    return None if value is None else decimal.Decimal(value).quantize(NUMERIC_SCALE)
+
+def _value_converter(field):
+    # bqtools keeps TIMESTAMP as epoch seconds, FLOAT nulls as NaN and NUMERIC
+    # at any precision, everything else is already in a type pyarrow accepts
+    field_type = field.field_type.upper()
+    if field_type in ['RECORD', 'STRUCT']:
+        converters = [(f.name, _value_converter(f)) for f in field.fields]
+        if not any(converter for name, converter in converters):
+            convert = None
+        else:
+            def convert(row):
+                if row is None:
+                    return None
+                return {
+                    name: converter(row.get(name)) if converter else row.get(name)
+                    for name, converter in converters
+                }
+    elif field_type == 'TIMESTAMP':
+        convert = _timestamp_to_micros
+    elif field_type == 'NUMERIC':
+        convert = _numeric_to_arrow
+    elif field_type == 'FLOAT':
+        convert = _float_to_arrow
+    else:
+        convert = None
+
+    if field.mode.upper() == 'REPEATED':
+        if convert is None:
+            return lambda values: [] if values is None else values
+        return lambda values: [] if values is None else [convert(v) for v in values]
+    return convert
+
+def to_arrow_array(column, field):
+    pa = _import_pyarrow()
+    arrow_type = to_arrow_field(field).type
+    if isinstance(column, storage.FixedWidthColumn) and field.mode.upper() != 'REPEATED' \
+            and field.field_type.upper() in ['INTEGER', 'FLOAT'] and not column.null_mask().any():
+        # typed storage without nulls: arrow takes the buffer as it is
+        return pa.array(column.to_numpy(), type=arrow_type, from_pandas=True)
+    if field.field_type.upper() == 'FLOAT' and field.mode.upper() != 'REPEATED':
+        return pa.array(list(column), type=arrow_type, from_pandas=True)
+
+    convert = _value_converter(field)
+    values = list(column) if convert is None else [convert(v) for v in column]
+    return pa.array(values, type=arrow_type)
+
+def to_arrow(schema, data):
+    pa = _import_pyarrow()
+    arrays = [to_arrow_array(column, field) for field, column in zip(schema, data)]
+    return pa.Table.from_arrays(arrays, schema=to_arrow_schema(schema))
+
+def from_arrow(arrow_table):
+    # returns schema and python columns, which still go through the BQTable conversions
+    schema = from_arrow_schema(arrow_table.schema)
+    data = [column.to_pylist() for column in arrow_table.columns]
+    return schema, data
+
+def write_parquet(where, schema, data, compression='snappy', row_group_size=None):
+    with instrumentation.timer('write_parquet', rows=len(data[0]) if data else 0):
+        pq = _import_parquet()
+        pq.write_table(to_arrow(schema, data), where, compression=compression, row_group_size=row_group_size)
+
+def read_parquet(where, columns=None):
+    with instrumentation.timer('read_parquet'):
+        pq = _import_parquet()
+        return from_arrow(pq.read_table(where, columns=columns))
+
+def parquet_stream(schema, data, compression='snappy'):
+    stream = io.BytesIO()
+    write_parquet(stream, schema, data, compression=compression)
+    stream.seek(0)
+    return stream
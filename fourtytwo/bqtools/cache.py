@@ -0,0 +1,49 @@
+import threading
+import time
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(credentials=None):
+    # one client per credentials file, shared by all reads and writes
+    with _clients_lock:
+        if credentials not in _clients:
+            from google.cloud import bigquery
+            if credentials:
+                _clients[credentials] = bigquery.Client.from_service_account_json(credentials)
+            else:
+                _clients[credentials] = bigquery.Client()
+        return _clients[credentials]
+
+def clear_clients():
+    with _clients_lock:
+        _clients.clear()
+
+
+class SchemaCache(object):
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+    def get(self, client, table_ref):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._schemas.get(table_ref)
+        if cached and now - cached[0] < self.ttl:
+            return cached[1]
+
+        from google.cloud import bigquery
+        schema = client.get_table(bigquery.Table(table_ref=table_ref)).schema
+        with self._lock:
+            self._schemas[table_ref] = (now, schema)
+        return schema
+
+    def invalidate(self, table_ref=None):
+        with self._lock:
+            if table_ref is None:
+                self._schemas.clear()
+            else:
+                self._schemas.pop(table_ref, None)
+
+schema_cache = SchemaCache()
@@ -1,63 +1,52 @@
 import decimal
+import itertools
 import math
 import datetime
 import logging
+import time
 import json
 
-import dateutil
-import pandas as pd
+from fourtytwo.bqtools import instrumentation
 
 NoneType = type(None)
+NULL_STRINGS = frozenset(['', 'None', 'nan'])
+NULL_DATETIME_STRINGS = frozenset(['', 'None', 'nan', 'False'])
+
+DATETIME_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%d %H:%M:%S%z',
+    '%Y-%m-%dT%H:%M:%S%z',
+    '%Y-%m-%d %H:%M:%S.%f%z',
+    '%Y-%m-%dT%H:%M:%S.%f%z',
+    '%Y-%m-%d',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d',
+]
+TIME_FORMATS = ['%H:%M:%S', '%H:%M:%S.%f']
+
+# columns longer than this are split into row slices when converted by an executor
+SLICE_SIZE = 100000
+
+def convert(column, field_type='STRING', mode='NULLABLE', fields=[], infer_required=False,
+            executor=None, slice_size=None):
+    if executor is not None:
+        return convert_columns(
+            [column], [(field_type, mode, fields)], infer_required, executor=executor, slice_size=slice_size
+        )[0]
 
-def convert(column, field_type='STRING', mode='NULLABLE', fields=[], infer_required=False):
     field_type = field_type.upper()
     mode = mode.upper()
 
-    if field_type == 'INTEGER':
+    if field_type in _BATCH_CONVERTERS:
+        batch_convert = _BATCH_CONVERTERS[field_type]
         if mode == 'REPEATED':
-            converted_column = []
-            for value in column:
-                converted_column.append([to_integer(v, mode, infer_required) for v in value])
+            values, lengths = _flatten(column)
+            converted_column = _unflatten(batch_convert(values, mode, infer_required), lengths)
         else:
-            converted_column = [
-                to_integer(value, mode, infer_required) for value in column
-            ]
-    elif field_type == 'STRING':
-        if mode == 'REPEATED':
-            converted_column = []
-            for value in column:
-                converted_column.append([to_string(v, mode, infer_required) for v in value])
-        else:
-            converted_column = [
-                to_string(value, mode, infer_required) for value in column
-            ]
-    elif field_type == 'NUMERIC':
-        if mode == 'REPEATED':
-            converted_column = []
-            for value in column:
-                converted_column.append([to_numeric(v, mode, infer_required) for v in value])
-        else:
-            converted_column = [
-                to_numeric(value, mode, infer_required) for value in column
-            ]
-    elif field_type == 'FLOAT':
-        if mode == 'REPEATED':
-            converted_column = []
-            for value in column:
-                converted_column.append([to_float(v, mode, infer_required) for v in value])
-        else:
-            converted_column = [
-                to_float(value, mode, infer_required) for value in column
-            ]
-    elif field_type == 'BOOLEAN':
-        if mode == 'REPEATED':
-            converted_column = []
-            for value in column:
-                converted_column.append([to_boolean(v, mode, infer_required) for v in value])
-        else:
-            converted_column = [
-                to_boolean(value, mode, infer_required) for value in column
-            ]
+            converted_column = batch_convert(column, mode, infer_required)
     elif field_type == 'BYTES':
         if mode == 'REPEATED':
             converted_column = []
@@ -67,63 +56,20 @@ def convert(column, field_type='STRING', mode='NULLABLE', fields=[], infer_requi
             converted_column = [
                 to_bytes(value, mode, infer_required) for value in column
             ]
-    elif field_type == 'DATETIME':
-        if mode == 'REPEATED':
-            converted_column = []
-            for value in column:
-                converted_column.append([to_datetime(v, mode, infer_required) for v in value])
-        else:
-            converted_column = [
-                to_datetime(value, mode, infer_required) for value in column
-            ]
-    elif field_type == 'DATE':
-        if mode == 'REPEATED':
-            converted_column = []
-            for value in column:
-                converted_column.append([to_date(v, mode, infer_required) for v in value])
-        else:
-            converted_column = [
-                to_date(value, mode, infer_required) for value in column
-            ]
-    elif field_type == 'TIME':
-        if mode == 'REPEATED':
-            converted_column = []
-            for value in column:
-                converted_column.append([to_time(v, mode, infer_required) for v in value])
-        else:
-            converted_column = [
-                to_time(value, mode, infer_required) for value in column
-            ]
-    elif field_type == 'TIMESTAMP':
-        if mode == 'REPEATED':
-            converted_column = []
-            for value in column:
-                converted_column.append([to_timestamp(v, mode, infer_required) for v in value])
-        else:
-            converted_column = [
-                to_timestamp(value, mode, infer_required) for value in column
-            ]
     elif field_type in ['STRUCT', 'RECORD']:
         if not fields:
             raise ValueError('Fields must be provided for STRUCT/RECORD')
         if mode == 'REPEATED':
-            if not isinstance(column[0], list):
+            first_row = next((row for row in column if row is not None), None)
+            if first_row is not None and not isinstance(first_row, list):
                 raise ValueError('For REPEATED mode in STRUCT/RECORD a list of dicts must be provided for each row')
-            converted_column = []
-            for r in column:
-                columns = pd.DataFrame(r).to_dict('list')
-                output = {}
-                for f in fields:
-                    output[f.name] = convert(columns.get(f.name, []), f.field_type, f.mode, f.fields)
-                converted_column.append(pd.DataFrame(output).to_dict('records'))
-        elif mode == 'NULLABLE':
-            if not isinstance(column[0], dict):
+            values, lengths = _flatten(column)
+            converted_column = _unflatten(_convert_records(values, fields, mode, infer_required), lengths)
+        else:
+            first_row = next((row for row in column if row is not None), None)
+            if first_row is not None and not isinstance(first_row, dict):
                 raise ValueError('For NULLABLE mode in STRUCT/RECORD only one dict is accepted per row')
-            columns = pd.DataFrame(column).to_dict('list')
-            output = {}
-            for f in fields:
-                output[f.name] = convert(columns.get(f.name, []), f.field_type, f.mode, f.fields)
-            converted_column = pd.DataFrame(output).to_dict('records')
+            converted_column = _convert_records(column, fields, mode, infer_required)
 
     elif field_type in ['ARRAY', 'GEOGRAPHY']:
         raise NotImplementedError('Types ARRAY and GEOGRAPHY are not yet implemented.')
@@ -131,6 +77,188 @@ def convert(column, field_type='STRING', mode='NULLABLE', fields=[], infer_requi
         raise ValueError('{} not a valid field_type.'.format(field_type))
     return converted_column
 
+def _convert_task(task):
+    # timed here, so the timings of process pool workers reach the sinks of the caller
+    column, field_type, mode, fields, infer_required = task
+    start = time.perf_counter()
+    converted_column = convert(column, field_type, mode, fields, infer_required)
+    return converted_column, time.perf_counter() - start
+
+def convert_columns(columns, field_specs, infer_required=False, executor=None, slice_size=None, names=None):
+    # field_specs holds one (field_type, mode, fields) per column. columns, or
+    # row slices of columns longer than slice_size, are converted as separate
+    # tasks. executor.map keeps their order, so the result does not depend on
+    # the executor or the number of workers.
+    slice_size = slice_size or SLICE_SIZE
+    tasks = []
+    n_slices = []
+    for column, (field_type, mode, fields) in zip(columns, field_specs):
+        if executor is not None and len(column) > slice_size:
+            slices = [column[start:start + slice_size] for start in range(0, len(column), slice_size)]
+        else:
+            slices = [column]
+        tasks.extend((values, field_type, mode, fields, infer_required) for values in slices)
+        n_slices.append(len(slices))
+
+    results = executor.map(_convert_task, tasks) if executor is not None else map(_convert_task, tasks)
+    converted_columns = []
+    for index, n in enumerate(n_slices):
+        parts, seconds = zip(*itertools.islice(results, n))
+        converted_columns.append(parts[0] if n == 1 else list(itertools.chain.from_iterable(parts)))
+        if instrumentation.enabled:
+            field_type, mode, fields = field_specs[index]
+            instrumentation.record_time(
+                'convert', sum(seconds),
+                field=names[index] if names else index, field_type=field_type, rows=len(columns[index])
+            )
+    return converted_columns
+
+def _flatten(column):
+    # a null REPEATED value is an empty list in BigQuery
+    column = [[] if value is None else value for value in column]
+    lengths = [len(value) for value in column]
+    return list(itertools.chain.from_iterable(column)), lengths
+
+def _unflatten(values, lengths):
+    values = iter(values)
+    return [list(itertools.islice(values, length)) for length in lengths]
+
+def _convert_records(rows, fields, mode, infer_required):
+    # transposes the dicts into one column per field, converts the columns
+    # (recursing into nested records) and zips them back into dicts
+    if mode == 'REQUIRED' and None in rows:
+        null_value = _null_value({}, mode, infer_required)
+        rows = [null_value if row is None else row for row in rows]
+    present_rows = [row for row in rows if row is not None]
+
+    field_names = [f.name for f in fields]
+    converted_fields = [
+        convert([row.get(f.name) for row in present_rows], f.field_type, f.mode, f.fields)
+        for f in fields
+    ]
+    records = [dict(zip(field_names, values)) for values in zip(*converted_fields)]
+    if len(present_rows) < len(rows):
+        records = iter(records)
+        return [None if row is None else next(records) for row in rows]
+    return records
+
+def _null_value(default, mode, infer_required, nullable_value=None):
+    if mode == 'REQUIRED':
+        if infer_required:
+            return default
+        else:
+            raise ValueError('None is not allowed.')
+    return nullable_value
+
+def _fill_nulls(converted_column, default, mode, infer_required):
+    # nulls are marked as None while converting, REQUIRED columns get them replaced afterwards
+    if mode == 'REQUIRED' and None in converted_column:
+        null_value = _null_value(default, mode, infer_required)
+        return [null_value if value is None else value for value in converted_column]
+    return converted_column
+
+# Batch converters check the set of python types in a column once and convert
+# homogeneous columns with a single pass of builtins. Mixed columns fall back to
+# the per-value functions, so results and errors are the same in both paths.
+# Columns of strings (e.g. read from CSV) are parsed with a single map of the
+# builtin; strings it rejects, like 'nan' or 'False', go to the per-value path.
+
+_FALSE_STRINGS = frozenset(['', '0', '0.0', 'False'])
+
+def _map_strings(parse, column):
+    try:
+        return list(map(parse, column))
+    except (ValueError, ArithmeticError):
+        return None
+
+def _batch_integer(column, mode, infer_required):
+    types = set(map(type, column))
+    if types <= {int}:
+        return list(column)
+    elif types <= {int, bool, float, NoneType}:
+        converted_column = [None if v is None or v != v else int(v) for v in column]
+        return _fill_nulls(converted_column, 0, mode, infer_required)
+    elif types <= {str}:
+        converted_column = _map_strings(int, column)
+        if converted_column is not None:
+            return converted_column
+    return [to_integer(v, mode, infer_required) for v in column]
+
+def _batch_float(column, mode, infer_required):
+    types = set(map(type, column))
+    if types <= {float}:
+        return list(column)
+    elif types <= {float, int, bool}:
+        return list(map(float, column))
+    elif types <= {float, int, bool, NoneType}:
+        null_value = _null_value(0.0, mode, infer_required, float('nan'))
+        return [null_value if v is None else float(v) for v in column]
+    elif types <= {str} and 'nan' not in column:
+        converted_column = _map_strings(float, column)
+        if converted_column is not None:
+            return converted_column
+    return [to_float(v, mode, infer_required) for v in column]
+
+def _batch_string(column, mode, infer_required):
+    types = set(map(type, column))
+    if types <= {str, NoneType}:
+        converted_column = [
+            None if v is None or v in NULL_STRINGS else v.replace('\n', ' ') for v in column
+        ]
+        return _fill_nulls(converted_column, '', mode, infer_required)
+    return [to_string(v, mode, infer_required) for v in column]
+
+def _batch_numeric(column, mode, infer_required):
+    types = set(map(type, column))
+    if types <= {decimal.Decimal}:
+        return list(column)
+    elif types <= {decimal.Decimal, int, NoneType}:
+        converted_column = [None if v is None else decimal.Decimal(v) for v in column]
+        return _fill_nulls(converted_column, decimal.Decimal('0.0'), mode, infer_required)
+    elif types <= {str} and 'nan' not in column:
+        converted_column = _map_strings(decimal.Decimal, column)
+        if converted_column is not None:
+            return converted_column
+    return [to_numeric(v, mode, infer_required) for v in column]
+
+def _batch_boolean(column, mode, infer_required):
+    types = set(map(type, column))
+    if types <= {bool}:
+        return list(column)
+    elif types <= {bool, int, NoneType}:
+        converted_column = [None if v is None else bool(v) for v in column]
+        return _fill_nulls(converted_column, False, mode, infer_required)
+    elif types <= {str} and 'None' not in column and 'nan' not in column:
+        return [v not in _FALSE_STRINGS for v in column]
+    return [to_boolean(v, mode, infer_required) for v in column]
+
+def _batch_temporal(column, mode, infer_required, to_value, from_datetime, formats=None):
+    parser = DatetimeParser(sample=column, formats=formats)
+    converted_column = []
+    for value in column:
+        if type(value) is str and value not in NULL_DATETIME_STRINGS:
+            value = parser.parse(value)
+        if type(value) is datetime.datetime:
+            converted_column.append(from_datetime(value))
+        else:
+            converted_column.append(to_value(value, mode, infer_required))
+    return converted_column
+
+def _batch_datetime(column, mode, infer_required):
+    return _batch_temporal(column, mode, infer_required, to_datetime, lambda dt: dt)
+
+def _batch_date(column, mode, infer_required):
+    return _batch_temporal(column, mode, infer_required, to_date, datetime.datetime.date)
+
+def _batch_time(column, mode, infer_required):
+    return _batch_temporal(
+        column, mode, infer_required, to_time, datetime.datetime.time,
+        formats=DATETIME_FORMATS + TIME_FORMATS
+    )
+
+def _batch_timestamp(column, mode, infer_required):
+    return _batch_temporal(column, mode, infer_required, to_timestamp, datetime.datetime.timestamp)
+
 def to_integer(value, mode='NULLABLE', infer_required=False):
     def handle_none():
         if mode == 'REQUIRED':
@@ -299,6 +427,73 @@ def to_bytes(value, mode='NULLABLE', infer_required=False):
 
     return bytes_value
 
+def _parse_datetime(value):
+    if hasattr(datetime.datetime, 'fromisoformat'):
+        try:
+            return datetime.datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return _dateutil_parse(value)
+
+def _dateutil_parse(value):
+    # dateutil is only imported once a string needs it
+    from dateutil import parser
+    return parser.parse(value)
+
+def _strptime(datetime_format):
+    def parse(value):
+        return datetime.datetime.strptime(value, datetime_format)
+    return parse
+
+# Parses the strings of one column: the first format that parses a sample of the
+# column is used for all rows, rows it fails on fall back to dateutil.
+# Parsed values are memoized, event tables tend to repeat the same timestamps.
+class DatetimeParser(object):
+    def __init__(self, sample=None, formats=None, sample_size=100, max_cache_size=100000):
+        self.formats = formats if formats else DATETIME_FORMATS
+        self.max_cache_size = max_cache_size
+        self._cache = {}
+        self._parse_format = self._detect_format(sample, sample_size) if sample else None
+
+    def _detect_format(self, sample, sample_size):
+        sample = list(itertools.islice(
+            (v for v in sample if isinstance(v, str) and v not in NULL_DATETIME_STRINGS),
+            sample_size
+        ))
+        if not sample:
+            return None
+
+        candidates = [_strptime(f) for f in self.formats]
+        if hasattr(datetime.datetime, 'fromisoformat'):
+            candidates.insert(0, datetime.datetime.fromisoformat)
+        for candidate in candidates:
+            try:
+                for value in sample:
+                    candidate(value)
+            except ValueError:
+                continue
+            return candidate
+        return None
+
+    def parse(self, value):
+        try:
+            return self._cache[value]
+        except KeyError:
+            pass
+
+        dt_value = None
+        if self._parse_format:
+            try:
+                dt_value = self._parse_format(value)
+            except ValueError:
+                pass
+        if dt_value is None:
+            dt_value = _dateutil_parse(value)
+
+        if len(self._cache) < self.max_cache_size:
+            self._cache[value] = dt_value
+        return dt_value
+
 def to_date(value, mode='NULLABLE', infer_required=False):
     if isinstance(value, datetime.datetime):
         return value.date()
@@ -329,7 +524,7 @@ def to_datetime(value, mode='NULLABLE', infer_required=False):
         if value in ['', 'None', 'nan', 'False']:
             dt_value = handle_none()
         else:
-            dt_value = dateutil.parser.parse(value)
+            dt_value = _parse_datetime(value)
     elif isinstance(value, (int, float)):
         dt_value = datetime.datetime.fromtimestamp(value)
     elif isinstance(value, (tuple, list)):
@@ -361,11 +556,13 @@ def to_time(value, mode='NULLABLE', infer_required=False):
         if value in ['', 'None', 'nan', 'False']:
             time_value = handle_none()
         else:
-            time_value = to_datetime(value, mode=mode, infer_required=infer_required).time
+            time_value = to_datetime(value, mode=mode, infer_required=infer_required).time()
     elif isinstance(value, (tuple, list)):
         time_value = datetime.time(*value)
+    elif isinstance(value, datetime.time):
+        time_value = value
     else:
-        time_value = to_datetime(value, mode=mode, infer_required=infer_required).time
+        time_value = to_datetime(value, mode=mode, infer_required=infer_required).time()
 
     return time_value
 
@@ -373,7 +570,8 @@ def to_timestamp(value, mode='NULLABLE', infer_required=False):
     if isinstance(value, (int, float)) and not math.isnan(value):
         ts_value = float(value)
     else:
-        ts_value = to_datetime(value, mode=mode, infer_required=infer_required).timestamp()
+        dt_value = to_datetime(value, mode=mode, infer_required=infer_required)
+        ts_value = None if dt_value is None else dt_value.timestamp()
     return ts_value
 
 def to_struct(value, mode='NULLABLE', infer_required=False):
@@ -385,3 +583,15 @@ def to_array(value, mode='NULLABLE', infer_required=False):
 def to_geograpy(value, mode='NULLABLE', infer_required=False):
     raise NotImplementedError('Conversion to GEOGRAPHY is not implemented yet.')
 
+_BATCH_CONVERTERS = {
+    'INTEGER': _batch_integer,
+    'FLOAT': _batch_float,
+    'STRING': _batch_string,
+    'NUMERIC': _batch_numeric,
+    'BOOLEAN': _batch_boolean,
+    'DATETIME': _batch_datetime,
+    'DATE': _batch_date,
+    'TIME': _batch_time,
+    'TIMESTAMP': _batch_timestamp,
+}
+
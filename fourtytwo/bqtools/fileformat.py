@@ -0,0 +1,409 @@
+import array
+import bisect
+import concurrent.futures
+import datetime
+import decimal
+import itertools
+import json
+import mmap
+import struct
+import sys
+import zlib
+
+from fourtytwo.bqtools import conversions
+from fourtytwo.bqtools import instrumentation
+from fourtytwo.bqtools import storage
+
+# File layout:
+#   MAGIC | column blocks | footer (json) | footer length (uint64 le) | MAGIC
+#
+# The data is split into row groups, every column of a row group is encoded
+# and compressed into its own block. The footer holds the schema and the
+# offset, length and codec of each block, so single columns and row ranges
+# can be read without decompressing the rest of the file.
+#
+# INTEGER blocks are int64, blocks with a value outside of int64 have an empty
+# int64 part followed by the values as decimal strings.
+
+MAGIC = b'BQT\x00'
+FORMAT_VERSION = 1
+CODECS = [None, 'zlib']
+
+_LENGTH = struct.Struct('<Q')
+
+
+def field_to_dict(field):
+    return {
+        'name': field.name,
+        'field_type': field.field_type,
+        'mode': field.mode,
+        'description': field.description,
+        'fields': [field_to_dict(f) for f in field.fields] if field.fields else [],
+    }
+
+def is_bqt_file(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+# -- encoding
+
+def _array_bytes(typecode, values):
+    values = array.array(typecode, values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+def _array_from_bytes(typecode, data):
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+def _encode_varwidth(values, parts):
+    encoded = [b'' if v is None else v for v in values]
+    parts.append(_array_bytes('q', itertools.accumulate(itertools.chain([0], map(len, encoded)))))
+    parts.append(b''.join(encoded))
+
+def _decode_varwidth(parts):
+    offsets = _array_from_bytes('q', next(parts))
+    data = bytes(next(parts))
+    return [data[a:b] for a, b in zip(offsets, offsets[1:])]
+
+def _encode_values(values, field_type, mode, fields, parts):
+    if mode == 'REPEATED':
+        parts.append(_array_bytes('q', [-1 if v is None else len(v) for v in values]))
+        values = list(itertools.chain.from_iterable(v for v in values if v is not None))
+        mode = 'NULLABLE'
+
+    parts.append(bytes([v is not None for v in values]))
+    if field_type in ['RECORD', 'STRUCT']:
+        present_rows = [v for v in values if v is not None]
+        for f in fields:
+            _encode_values(
+                [row.get(f['name']) for row in present_rows],
+                f['field_type'].upper(), f['mode'].upper(), f['fields'], parts
+            )
+    elif field_type == 'INTEGER':
+        try:
+            parts.append(_array_bytes('q', [0 if v is None else v for v in values]))
+        except OverflowError:
+            parts.append(b'')
+            _encode_varwidth([None if v is None else str(v).encode('ascii') for v in values], parts)
+    elif field_type == 'FLOAT':
+        parts.append(_array_bytes('d', [0.0 if v is None else v for v in values]))
+    elif field_type == 'TIMESTAMP':
+        parts.append(_array_bytes('d', [0.0 if v is None else v for v in values]))
+    elif field_type == 'BOOLEAN':
+        parts.append(bytes([bool(v) for v in values]))
+    elif field_type == 'DATE':
+        parts.append(_array_bytes('q', [0 if v is None else v.toordinal() for v in values]))
+    elif field_type == 'BYTES':
+        _encode_varwidth(values, parts)
+    elif field_type in ['STRING', 'NUMERIC', 'DATETIME', 'TIME']:
+        if field_type == 'STRING':
+            strings = values
+        elif field_type == 'NUMERIC':
+            strings = [None if v is None else str(v) for v in values]
+        else:
+            strings = [None if v is None else v.isoformat() for v in values]
+        _encode_varwidth([None if v is None else v.encode('utf8') for v in strings], parts)
+    else:
+        raise NotImplementedError('{} cannot be saved yet.'.format(field_type))
+
+def _decode_values(parts, field_type, mode, fields):
+    if mode == 'REPEATED':
+        lengths = _array_from_bytes('q', next(parts))
+        values = iter(_decode_values(parts, field_type, 'NULLABLE', fields))
+        return [
+            None if length < 0 else list(itertools.islice(values, length))
+            for length in lengths
+        ]
+
+    validity = next(parts)
+    if field_type in ['RECORD', 'STRUCT']:
+        field_names = [f['name'] for f in fields]
+        field_values = [
+            _decode_values(parts, f['field_type'].upper(), f['mode'].upper(), f['fields'])
+            for f in fields
+        ]
+        records = iter([dict(zip(field_names, row)) for row in zip(*field_values)])
+        return [next(records) if valid else None for valid in validity]
+    elif field_type == 'INTEGER':
+        values = _array_from_bytes('q', next(parts))
+        if len(values) < len(validity):
+            values = [int(v) if valid else None for v, valid in zip(_decode_varwidth(parts), validity)]
+    elif field_type in ['FLOAT', 'TIMESTAMP']:
+        values = _array_from_bytes('d', next(parts))
+    elif field_type == 'BOOLEAN':
+        values = map(bool, next(parts))
+    elif field_type == 'DATE':
+        values = _array_from_bytes('q', next(parts))
+        return [datetime.date.fromordinal(v) if valid else None for v, valid in zip(values, validity)]
+    elif field_type == 'BYTES':
+        values = _decode_varwidth(parts)
+    else:
+        values = [str(v, 'utf8') if valid else None for v, valid in zip(_decode_varwidth(parts), validity)]
+        if field_type == 'NUMERIC':
+            return [None if v is None else decimal.Decimal(v) for v in values]
+        elif field_type in ['DATETIME', 'TIME']:
+            return conversions.convert(values, field_type)
+        return values
+    return [value if valid else None for value, valid in zip(values, validity)]
+
+def encode_block(values, field, codec='zlib', level=6):
+    parts = []
+    _encode_values(values, field['field_type'].upper(), field['mode'].upper(), field['fields'], parts)
+    block = b''.join(_LENGTH.pack(len(part)) + part for part in parts)
+    if codec == 'zlib':
+        block = zlib.compress(block, level)
+    return block
+
+def _iter_parts(block):
+    position = 0
+    while position < len(block):
+        (length,) = _LENGTH.unpack_from(block, position)
+        position += _LENGTH.size
+        yield block[position:position + length]
+        position += length
+
+def decode_block(block, field, codec='zlib'):
+    if codec == 'zlib':
+        block = zlib.decompress(block)
+    return _decode_values(
+        _iter_parts(block), field['field_type'].upper(), field['mode'].upper(), field['fields']
+    )
+
+# -- files
+
+def write_table(filename, schema, columns, row_group_size=100000, codec='zlib', level=6, metadata=None):
+    with instrumentation.timer('write_table', filename=filename, rows=len(columns[0]) if columns else 0):
+        if codec not in CODECS:
+            raise ValueError('codec must be one of {}'.format(CODECS))
+        schema = [field_to_dict(field) for field in schema]
+        num_rows = len(columns[0]) if columns else 0
+
+        row_groups = []
+        with open(filename, 'wb') as f:
+            f.write(MAGIC)
+            for start in range(0, num_rows, row_group_size):
+                end = min(start + row_group_size, num_rows)
+                blocks = []
+                for field, column in zip(schema, columns):
+                    block = encode_block(column[start:end], field, codec, level)
+                    blocks.append({'offset': f.tell(), 'length': len(block), 'codec': codec})
+                    f.write(block)
+                row_groups.append({'num_rows': end - start, 'columns': blocks})
+
+            footer = json.dumps({
+                'version': FORMAT_VERSION,
+                'num_rows': num_rows,
+                'schema': schema,
+                'row_groups': row_groups,
+                'metadata': metadata or {},
+            }).encode('utf8')
+            f.write(footer)
+            f.write(_LENGTH.pack(len(footer)))
+            f.write(MAGIC)
+
+def read_footer(f):
+    f.seek(-(_LENGTH.size + len(MAGIC)), 2)
+    (footer_length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a bqtools table file')
+    f.seek(-(footer_length + _LENGTH.size + len(MAGIC)), 2)
+    footer = json.loads(f.read(footer_length).decode('utf8'))
+    if footer['version'] > FORMAT_VERSION:
+        raise ValueError('file format version {} is not supported, update bqtools'.format(footer['version']))
+    return footer
+
+def select_row_groups(footer, start=None, stop=None):
+    # returns (row_group, first row of the row group) for all row groups in [start, stop)
+    start = start or 0
+    stop = footer['num_rows'] if stop is None else min(stop, footer['num_rows'])
+    selected = []
+    first_row = 0
+    for row_group in footer['row_groups']:
+        end_row = first_row + row_group['num_rows']
+        if end_row > start and first_row < stop:
+            selected.append((row_group, first_row))
+        first_row = end_row
+    return selected, start, stop
+
+def read_table(filename, columns=None, rows=None, workers=None):
+    with instrumentation.timer('read_table', filename=filename):
+        with open(filename, 'rb') as f:
+            footer = read_footer(f)
+            schema = footer['schema']
+            field_names = [field['name'] for field in schema]
+            column_indexes = [field_names.index(name) for name in columns] if columns else range(len(schema))
+            start, stop = rows if rows else (None, None)
+            row_groups, start, stop = select_row_groups(footer, start, stop)
+
+            # blocks are read sequentially, decompressed and decoded in parallel
+            tasks = []
+            for row_group, first_row in row_groups:
+                for index in column_indexes:
+                    block = row_group['columns'][index]
+                    f.seek(block['offset'])
+                    tasks.append((f.read(block['length']), schema[index], block['codec']))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            decoded = list(executor.map(lambda task: decode_block(*task), tasks))
+
+        n_columns = len(column_indexes)
+        data = [[] for index in column_indexes]
+        for n, values in enumerate(decoded):
+            data[n % n_columns].extend(values)
+
+        # trim the first and last row group to the requested row range
+        if row_groups and data:
+            offset = start - row_groups[0][1]
+            if offset or len(data[0]) > stop - start:
+                data = [column[offset:offset + stop - start] for column in data]
+        return [schema[index] for index in column_indexes], data, footer.get('metadata', {})
+
+# -- memory-mapped tables
+
+_FIXED_WIDTH_FORMATS = {'INTEGER': 'q', 'FLOAT': 'd', 'TIMESTAMP': 'd', 'BOOLEAN': 'B'}
+
+
+class _FixedWidthView(object):
+    # zero-copy view of an uncompressed fixed-width block inside the mapped file
+    def __init__(self, block, field_type):
+        parts = _iter_parts(block)
+        self.validity = next(parts)
+        self.values = next(parts).cast(_FIXED_WIDTH_FORMATS[field_type])
+        self.has_nulls = 0 in self.validity
+        self.to_value = bool if field_type == 'BOOLEAN' else None
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            values = self.values[index].tolist()
+            validity = self.validity[index] if self.has_nulls else None
+        else:
+            if self.has_nulls and not self.validity[index]:
+                return None
+            value = self.values[index]
+            return self.to_value(value) if self.to_value else value
+        if self.to_value:
+            values = list(map(self.to_value, values))
+        if validity is not None:
+            values = [value if valid else None for value, valid in zip(values, validity)]
+        return values
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+class MappedColumn(storage.Column):
+    # read-only column over the blocks of a memory-mapped .bqt file.
+    # blocks are only decoded when their rows are accessed.
+    def __init__(self, field, blocks):
+        self.field = field
+        self.field_type = field['field_type'].upper()
+        self._blocks = blocks
+        self._starts = list(itertools.accumulate([0] + [num_rows for num_rows, block, codec in blocks]))
+        self._length = self._starts.pop()
+        self._validity = None
+        self._groups = {}
+
+    def _is_fixed_width(self, codec):
+        return (
+            codec is None and sys.byteorder == 'little'
+            and self.field_type in _FIXED_WIDTH_FORMATS and self.field['mode'].upper() != 'REPEATED'
+        )
+
+    def _group(self, index):
+        if index not in self._groups:
+            num_rows, block, codec = self._blocks[index]
+            view = _FixedWidthView(block, self.field_type) if self._is_fixed_width(codec) else None
+            if view is not None and len(view) == num_rows:
+                self._groups[index] = view
+            else:
+                self._groups[index] = decode_block(block, self.field, codec)
+        return self._groups[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            values = []
+            for group_index, group_start in enumerate(self._starts):
+                group_stop = group_start + self._blocks[group_index][0]
+                if group_stop > start and group_start < stop:
+                    values.extend(self._group(group_index)[
+                        max(start - group_start, 0):min(stop, group_stop) - group_start
+                    ])
+            return values
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('column index out of range')
+        group_index = bisect.bisect_right(self._starts, index) - 1
+        return self._group(group_index)[index - self._starts[group_index]]
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._group(index) for index in range(len(self._blocks)))
+
+    def is_valid(self, index):
+        return self[index] is not None
+
+    def extend(self, values):
+        raise TypeError('memory-mapped columns are read-only')
+
+    def to_numpy(self):
+        import numpy as np
+
+        groups = [self._group(index) for index in range(len(self._blocks))]
+        if groups and all(isinstance(group, _FixedWidthView) and not group.has_nulls for group in groups):
+            dtype = 'bool' if self.field_type == 'BOOLEAN' else _FIXED_WIDTH_FORMATS[self.field_type]
+            arrays = [np.frombuffer(group.values, dtype=dtype) for group in groups]
+            return arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+        column = storage.make_column(self.tolist(), self.field_type, self.field['mode'])
+        if isinstance(column, storage.Column):
+            return column.to_numpy()
+        return np.array(column, dtype=object)
+
+    def to_numpy_masked(self):
+        import numpy as np
+
+        groups = [self._group(index) for index in range(len(self._blocks))]
+        if not groups or not all(isinstance(group, _FixedWidthView) for group in groups):
+            # compressed blocks, decoded into a typed column first (TIMESTAMPs are float seconds)
+            column_type = storage.COLUMN_TYPES.get(self.field_type, storage.FloatColumn)
+            return column_type(self.tolist()).to_numpy_masked()
+        dtype = _FIXED_WIDTH_FORMATS[self.field_type]
+        arrays = [np.frombuffer(group.values, dtype=dtype) for group in groups]
+        values = arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+        if not any(group.has_nulls for group in groups):
+            return values, None
+        validity = np.concatenate([np.frombuffer(group.validity, dtype='uint8') for group in groups])
+        return values, validity == 0
+
+def map_table(filename, columns=None):
+    with instrumentation.timer('map_table', filename=filename):
+        with open(filename, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        footer = read_footer(mapped)
+        schema = footer['schema']
+        field_names = [field['name'] for field in schema]
+        column_indexes = [field_names.index(name) for name in columns] if columns else range(len(schema))
+
+        buffer = memoryview(mapped)
+        data = []
+        for index in column_indexes:
+            blocks = []
+            for row_group in footer['row_groups']:
+                block = row_group['columns'][index]
+                blocks.append((
+                    row_group['num_rows'],
+                    buffer[block['offset']:block['offset'] + block['length']],
+                    block['codec']
+                ))
+            data.append(MappedColumn(schema[index], blocks))
+        return [schema[index] for index in column_indexes], data, footer.get('metadata', {})
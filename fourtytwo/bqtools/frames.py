@@ -0,0 +1,166 @@
+from fourtytwo.bqtools import conversions
+from fourtytwo.bqtools import inference
+from fourtytwo.bqtools import schemas
+from fourtytwo.bqtools import storage
+
+# pandas DataFrames with a dtype per field type:
+#
+#   INTEGER    Int64                 FLOAT      float64 (nulls are NaN)
+#   BOOLEAN    boolean               STRING     string
+#   TIMESTAMP  datetime64[us, UTC]   DATETIME   datetime64[us]
+#
+# all other field types and REPEATED fields are object columns of the python
+# values, so DATE, TIME and NUMERIC values survive a round trip unchanged.
+# Typed and memory-mapped columns hand over their buffers, lists are
+# converted by numpy and pandas.
+
+_MASKED_TYPES = ['INTEGER', 'FLOAT', 'BOOLEAN', 'TIMESTAMP']
+
+
+def _masked_values(column, field_type):
+    import numpy as np
+
+    if hasattr(column, 'to_numpy_masked'):
+        return column.to_numpy_masked()
+    if field_type == 'INTEGER':
+        # None and integers outside of int64 are left to pandas
+        return None
+    values = np.array([None if v is None else v for v in column], dtype='float64')
+    return values, np.isnan(values)
+
+def _object_array(column):
+    import numpy as np
+
+    return np.fromiter(column, dtype=object, count=len(column))
+
+def _naive_datetimes(column):
+    # DATETIMEs parsed from strings with an offset are aware, numpy only
+    # takes naive values, so they become naive UTC
+    import datetime
+
+    return [
+        v.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        if v is not None and v.tzinfo is not None else v
+        for v in column
+    ]
+
+def to_array(field, column):
+    import numpy as np
+    import pandas as pd
+
+    field_type = field.field_type.upper()
+    if field.mode.upper() == 'REPEATED' or field_type not in _MASKED_TYPES + ['STRING', 'DATETIME']:
+        return _object_array(column)
+    elif field_type == 'STRING':
+        return pd.array(column if isinstance(column, list) else list(column), dtype='string')
+    elif field_type == 'DATETIME':
+        try:
+            return pd.array(column if isinstance(column, list) else list(column), dtype='datetime64[us]')
+        except ValueError:
+            return pd.array(_naive_datetimes(column), dtype='datetime64[us]')
+
+    masked = _masked_values(column, field_type)
+    if masked is None:
+        return pd.array(column if isinstance(column, list) else list(column), dtype='Int64')
+    values, null_mask = masked
+    if field_type == 'INTEGER':
+        return pd.arrays.IntegerArray(values, np.zeros(len(values), dtype=bool) if null_mask is None else null_mask)
+    elif field_type == 'BOOLEAN':
+        return pd.arrays.BooleanArray(
+            values.astype(bool), np.zeros(len(values), dtype=bool) if null_mask is None else null_mask
+        )
+    elif field_type == 'FLOAT':
+        if null_mask is not None:
+            values = np.where(null_mask, np.nan, values)
+        return values
+    # TIMESTAMPs are float seconds since the epoch
+    micros = np.round(values * 1e6)
+    if null_mask is not None:
+        micros[null_mask] = 0
+    timestamps = micros.astype('int64').view('datetime64[us]')
+    if null_mask is not None:
+        timestamps[null_mask] = np.datetime64('NaT')
+    return pd.DatetimeIndex(timestamps).tz_localize('UTC').array
+
+def to_df(schema, data):
+    import pandas as pd
+
+    return pd.DataFrame(
+        {field.name: to_array(field, column) for field, column in zip(schema, data)},
+        columns=[field.name for field in schema]
+    )
+
+
+def field_type_from_dtype(dtype):
+    import pandas as pd
+
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'BOOLEAN'
+    elif pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    elif pd.api.types.is_float_dtype(dtype):
+        return 'FLOAT'
+    elif isinstance(dtype, pd.DatetimeTZDtype):
+        return 'TIMESTAMP'
+    elif pd.api.types.is_datetime64_dtype(dtype):
+        return 'DATETIME'
+    elif isinstance(dtype, pd.StringDtype):
+        return 'STRING'
+    return None
+
+def from_series(series, field_type, storage_type='list'):
+    import numpy as np
+
+    null_mask = series.isna().to_numpy()
+    if field_type == 'FLOAT':
+        # like conversions.to_float, nulls stay NaN
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        return storage.FloatColumn.from_numpy(values) if storage_type == 'typed' else values.tolist()
+    elif field_type in ['INTEGER', 'BOOLEAN']:
+        column_type = storage.COLUMN_TYPES[field_type]
+        values = series.to_numpy(dtype=column_type.typecode, na_value=column_type.null_value)
+        if storage_type == 'typed':
+            return column_type.from_numpy(values, null_mask)
+        values = values.astype(bool).tolist() if field_type == 'BOOLEAN' else values.tolist()
+    elif field_type == 'TIMESTAMP':
+        micros = series.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy(dtype='datetime64[us]')
+        values = (micros.view('int64') / 1e6).tolist()
+    elif field_type == 'DATETIME':
+        # numpy makes the datetime objects, NaT becomes None
+        return series.to_numpy(dtype='datetime64[us]').astype(object).tolist()
+    else:
+        return series.to_numpy(dtype=object, na_value=None).tolist()
+    if null_mask.any():
+        for index in np.flatnonzero(null_mask).tolist():
+            values[index] = None
+    return values
+
+def from_df(df, storage_type='list', executor=None):
+    # columns with a dtype of one of the field types are converted as a whole,
+    # the field types of object columns are inferred and their values converted
+    schema, data = [], []
+    object_indexes = []
+    for name in df.columns:
+        series = df[name]
+        field_type = field_type_from_dtype(series.dtype)
+        if field_type is None:
+            values = series.to_numpy(dtype=object, na_value=None).tolist()
+            field = inference.infer_schema({str(name): values}, parse_strings=False)[0]
+            object_indexes.append(len(data))
+        else:
+            field = schemas.SchemaField(str(name), field_type)
+            values = from_series(series, field_type, storage_type)
+        schema.append(field)
+        data.append(values)
+
+    if object_indexes:
+        fields = [schema[index] for index in object_indexes]
+        converted = conversions.convert_columns(
+            [data[index] for index in object_indexes],
+            [(field.field_type, field.mode, field.fields) for field in fields],
+            executor=executor,
+            names=[field.name for field in fields]
+        )
+        for index, column in zip(object_indexes, converted):
+            data[index] = column
+    return schema, data
@@ -0,0 +1,201 @@
+import datetime
+import decimal
+import math
+
+from fourtytwo.bqtools import conversions
+from fourtytwo.bqtools import schemas
+
+# Schema inference: field types, modes and nested fields are inferred from a
+# sample of rows in one pass. Fields are NULLABLE, so rows with nulls can be
+# appended later on. With required=True, fields are REQUIRED if the sample
+# covered every row and none of them was null.
+
+SAMPLE_SIZE = 1000
+
+# the type two types are widened to, all other combinations become STRING
+_SUPERTYPES = {
+    frozenset(['INTEGER', 'FLOAT']): 'FLOAT',
+    frozenset(['INTEGER', 'NUMERIC']): 'NUMERIC',
+    frozenset(['FLOAT', 'NUMERIC']): 'FLOAT',
+    frozenset(['DATE', 'DATETIME']): 'DATETIME',
+    frozenset(['DATE', 'TIMESTAMP']): 'TIMESTAMP',
+    frozenset(['DATETIME', 'TIMESTAMP']): 'TIMESTAMP',
+}
+
+_DATE_FORMATS = ['%Y-%m-%d', '%Y/%m/%d']
+
+
+def _is_null(value):
+    if value is None:
+        return True
+    elif isinstance(value, float):
+        return math.isnan(value)
+    elif isinstance(value, str):
+        return value in conversions.NULL_STRINGS
+    return False
+
+def _datetime_type(value):
+    return 'TIMESTAMP' if value.tzinfo is not None else 'DATETIME'
+
+def _string_type(value):
+    # only formats that conversions turns into the inferred type
+    if value in ['True', 'False']:
+        return 'BOOLEAN'
+    try:
+        int(value)
+        return 'INTEGER'
+    except ValueError:
+        pass
+    try:
+        float(value)
+        return 'FLOAT'
+    except ValueError:
+        pass
+
+    if len(value) >= 10 and value[4] in '-/':
+        try:
+            dt_value = datetime.datetime.fromisoformat(value)
+            return 'DATE' if len(value) == 10 else _datetime_type(dt_value)
+        except ValueError:
+            pass
+        for datetime_format in conversions.DATETIME_FORMATS:
+            try:
+                dt_value = datetime.datetime.strptime(value, datetime_format)
+            except ValueError:
+                continue
+            return 'DATE' if datetime_format in _DATE_FORMATS else _datetime_type(dt_value)
+    elif ':' in value:
+        for time_format in conversions.TIME_FORMATS:
+            try:
+                datetime.datetime.strptime(value, time_format)
+                return 'TIME'
+            except ValueError:
+                continue
+    return 'STRING'
+
+def value_type(value, parse_strings=True):
+    if isinstance(value, bool):
+        return 'BOOLEAN'
+    elif isinstance(value, int):
+        return 'INTEGER'
+    elif isinstance(value, float):
+        return 'FLOAT'
+    elif isinstance(value, decimal.Decimal):
+        return 'NUMERIC'
+    elif isinstance(value, str):
+        return _string_type(value) if parse_strings else 'STRING'
+    elif isinstance(value, bytes):
+        return 'BYTES'
+    elif isinstance(value, datetime.datetime):
+        return _datetime_type(value)
+    elif isinstance(value, datetime.date):
+        return 'DATE'
+    elif isinstance(value, datetime.time):
+        return 'TIME'
+    elif isinstance(value, dict):
+        return 'RECORD'
+    raise ValueError('cannot infer the field type of {!r}'.format(value))
+
+def merge_types(field_types):
+    merged = None
+    for field_type in sorted(field_types):
+        if merged is None or merged == field_type:
+            merged = field_type
+        elif 'RECORD' in (merged, field_type):
+            raise ValueError('RECORD values cannot be mixed with {}'.format(
+                field_type if merged == 'RECORD' else merged))
+        else:
+            merged = _SUPERTYPES.get(frozenset([merged, field_type]), 'STRING')
+    return merged or 'STRING'
+
+
+class _FieldState(object):
+    def __init__(self, parse_strings=True):
+        self.parse_strings = parse_strings
+        self.types = set()
+        self.n_seen = 0
+        self.n_nulls = 0
+        self.n_records = 0
+        self.repeated = False
+        self.scalar = False
+        self.fields = {}
+
+    def add(self, value):
+        self.n_seen += 1
+        if isinstance(value, (list, tuple)):
+            self.repeated = True
+            for v in value:
+                if isinstance(v, (list, tuple)):
+                    raise ValueError('arrays of arrays are not supported by BigQuery')
+                self._add_value(v)
+        elif _is_null(value):
+            self.n_nulls += 1
+        else:
+            self.scalar = True
+            self._add_value(value)
+
+    def _add_value(self, value):
+        if _is_null(value):
+            return
+        field_type = value_type(value, self.parse_strings)
+        self.types.add(field_type)
+        if field_type == 'RECORD':
+            self.n_records += 1
+            for name, v in value.items():
+                if name not in self.fields:
+                    self.fields[name] = _FieldState(self.parse_strings)
+                self.fields[name].add(v)
+
+    def to_field(self, name, complete, n_expected):
+        if self.repeated and self.scalar:
+            raise ValueError('field {} mixes arrays and single values'.format(name))
+        field_type = merge_types(self.types)
+        if self.repeated:
+            mode = 'REPEATED'
+        elif complete and self.n_nulls == 0 and self.n_seen == n_expected:
+            mode = 'REQUIRED'
+        else:
+            mode = 'NULLABLE'
+        fields = ()
+        if field_type == 'RECORD':
+            fields = [
+                state.to_field(field_name, complete, self.n_records)
+                for field_name, state in self.fields.items()
+            ]
+        return schemas.SchemaField(name, field_type, mode=mode, fields=fields)
+
+
+def sample_indexes(n_rows, sample=SAMPLE_SIZE):
+    # evenly spaced rows, so the sample also covers data appended later on
+    if sample is None or n_rows <= sample:
+        return range(n_rows)
+    return [index * n_rows // sample for index in range(sample)]
+
+def infer_schema(data, sample=SAMPLE_SIZE, parse_strings=True, required=False):
+    # data is a list of dict rows, a list of columns or a dict of named columns
+    if isinstance(data, dict):
+        field_names = list(data.keys())
+        columns = list(data.values())
+    elif data and all(isinstance(row, dict) for row in data):
+        indexes = sample_indexes(len(data), sample)
+        states = {}
+        for index in indexes:
+            for name, value in data[index].items():
+                if name not in states:
+                    states[name] = _FieldState(parse_strings)
+                states[name].add(value)
+        complete = required and len(indexes) == len(data)
+        return [state.to_field(name, complete, len(indexes)) for name, state in states.items()]
+    else:
+        field_names = ['column_{}'.format(n) for n in range(len(data))]
+        columns = data
+
+    n_rows = max([len(column) for column in columns]) if columns else 0
+    indexes = sample_indexes(n_rows, sample)
+    schema = []
+    for name, column in zip(field_names, columns):
+        state = _FieldState(parse_strings)
+        for index in indexes:
+            state.add(column[index] if index < len(column) else None)
+        schema.append(state.to_field(name, required and len(indexes) == n_rows, len(indexes)))
+    return schema
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+
+# Timers, counters and traces for the hot paths of bqtools.
+#
+# Events are dicts passed to every registered sink, a sink is any callable:
+#
+#   stats = instrumentation.StatsSink()
+#   instrumentation.add_sink(stats)
+#   table = bqtools.BQTable(schema=schema, data=data)
+#   stats.stats['convert.number']   # {'count': 1, 'seconds': ..., 'rows': ...}
+#
+# Without sinks, call sites only check the enabled flag:
+#
+#   if instrumentation.enabled:
+#       instrumentation.trace('bqtools.load', filename)
+#
+# and timer() returns a shared no-op context manager.
+
+enabled = False
+
+_sinks = []
+_sinks_lock = threading.Lock()
+
+
+def add_sink(sink):
+    global enabled
+    with _sinks_lock:
+        _sinks.append(sink)
+        enabled = True
+    return sink
+
+def remove_sink(sink):
+    global enabled
+    with _sinks_lock:
+        _sinks.remove(sink)
+        enabled = bool(_sinks)
+
+def clear_sinks():
+    global enabled
+    with _sinks_lock:
+        del _sinks[:]
+        enabled = False
+
+def enable_logging(level=logging.DEBUG, logger=None):
+    # what DEBUG = True used to do, at runtime
+    return add_sink(LoggingSink(level=level, logger=logger))
+
+def emit(event):
+    for sink in list(_sinks):
+        sink(event)
+
+def trace(name, *args):
+    if enabled:
+        emit({'type': 'trace', 'name': name, 'args': args})
+
+def count(name, value=1, **tags):
+    if enabled:
+        emit({'type': 'counter', 'name': name, 'value': value, 'tags': tags})
+
+def record_time(name, seconds, **tags):
+    # for timings measured elsewhere, e.g. in the workers of a process pool
+    if enabled:
+        emit({'type': 'timer', 'name': name, 'seconds': seconds, 'tags': tags})
+
+
+class _Timer(object):
+    __slots__ = ['name', 'tags', 'start']
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.tags['error'] = exc_type.__name__
+        record_time(self.name, seconds, **self.tags)
+        return False
+
+
+class _NullTimer(object):
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+def timer(name, **tags):
+    if not enabled:
+        return _NULL_TIMER
+    return _Timer(name, tags)
+
+
+# -- sinks
+
+class LoggingSink(object):
+    def __init__(self, level=logging.DEBUG, logger=None):
+        self.level = level
+        self.logger = logger or logging.getLogger('bqtools')
+
+    def __call__(self, event):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        if event['type'] == 'trace':
+            self.logger.log(self.level, '{}({})'.format(event['name'], ', '.join(map(str, event['args']))))
+        elif event['type'] == 'timer':
+            self.logger.log(self.level, '{} {:.6f}s {}'.format(event['name'], event['seconds'], event['tags']))
+        else:
+            self.logger.log(self.level, '{} +{} {}'.format(event['name'], event['value'], event['tags']))
+
+
+class StatsSink(object):
+    # aggregates timers and counters by name, and by the values of the
+    # group_by tags, e.g. 'convert.number' for the conversions of field number
+    def __init__(self, group_by=('field',)):
+        self.group_by = group_by
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _key(self, event):
+        tags = event.get('tags', {})
+        return '.'.join([event['name']] + [str(tags[tag]) for tag in self.group_by if tag in tags])
+
+    def __call__(self, event):
+        if event['type'] == 'trace':
+            return
+        key = self._key(event)
+        with self._lock:
+            stats = self.stats.setdefault(key, {'count': 0})
+            stats['count'] += 1
+            if event['type'] == 'timer':
+                stats['seconds'] = stats.get('seconds', 0.0) + event['seconds']
+                stats['max_seconds'] = max(stats.get('max_seconds', 0.0), event['seconds'])
+                if 'rows' in event['tags']:
+                    stats['rows'] = stats.get('rows', 0) + event['tags']['rows']
+            else:
+                stats['value'] = stats.get('value', 0) + event['value']
+
+    def clear(self):
+        with self._lock:
+            self.stats.clear()
@@ -0,0 +1,148 @@
+import datetime
+import decimal
+import re
+
+# SQL for reads of a single table. Column names are validated and quoted,
+# values are never formatted into the SQL, they are passed as query parameters:
+#
+#   query = Query('project.dataset.table', columns=['id', 'country'],
+#                 filters=[('country', 'in', ['DE', 'AT']), ('score', '>=', 0.5)],
+#                 date_range=('created', datetime.date(2020, 1, 1), None), sample=10)
+#   query.sql
+#   # select `id`, `country` from `project.dataset.table` tablesample system (10 percent)
+#   # where `country` in unnest(@p0) and `score` >= @p1 and DATE(`created`) >= @p2
+#   client.query(query.sql, job_config=query.job_config())
+#
+# filters are (column, operator, value) tuples or a dict of column: value
+# (None is null, lists and tuples are in). date_range is (column, start, end)
+# with inclusive, optional bounds, for ingestion-time partitioned tables the
+# column is _PARTITIONTIME or _PARTITIONDATE. Date bounds are compared with
+# DATE(column), so they work on DATE, DATETIME and TIMESTAMP columns and the
+# end date includes its whole day.
+
+OPERATORS = ['=', '!=', '<', '<=', '>', '>=', 'like', 'not like', 'in', 'not in', 'is null', 'is not null']
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+_TABLE_REF = re.compile(r'^[A-Za-z0-9_.:-]+$')
+
+
+def quote_identifier(name):
+    if not isinstance(name, str) or not _IDENTIFIER.match(name):
+        raise ValueError('{!r} is not a valid column name'.format(name))
+    return '.'.join('`{}`'.format(part) for part in name.split('.'))
+
+def parameter_type(value):
+    if isinstance(value, bool):
+        return 'BOOL'
+    elif isinstance(value, int):
+        return 'INT64'
+    elif isinstance(value, float):
+        return 'FLOAT64'
+    elif isinstance(value, decimal.Decimal):
+        return 'NUMERIC'
+    elif isinstance(value, str):
+        return 'STRING'
+    elif isinstance(value, bytes):
+        return 'BYTES'
+    elif isinstance(value, datetime.datetime):
+        return 'TIMESTAMP' if value.tzinfo is not None else 'DATETIME'
+    elif isinstance(value, datetime.date):
+        return 'DATE'
+    elif isinstance(value, datetime.time):
+        return 'TIME'
+    raise ValueError('{!r} cannot be used as a query parameter'.format(value))
+
+def _normalize_filters(filters):
+    if filters is None:
+        return []
+    if isinstance(filters, dict):
+        normalized = []
+        for column, value in filters.items():
+            if value is None:
+                normalized.append((column, 'is null', None))
+            elif isinstance(value, (list, tuple, set, frozenset)):
+                normalized.append((column, 'in', value))
+            else:
+                normalized.append((column, '=', value))
+        return normalized
+    return [tuple(f) if len(f) == 3 else (f[0], f[1], None) for f in filters]
+
+
+class Query(object):
+    def __init__(self, table_ref, columns=None, filters=None, date_range=None, sample=None, limit=None):
+        if not _TABLE_REF.match(table_ref):
+            raise ValueError('{!r} is not a valid table reference'.format(table_ref))
+        self.table_ref = table_ref
+        self.columns = list(columns) if columns else None
+        self.filters = _normalize_filters(filters)
+        self.date_range = date_range
+        self.sample = sample
+        self.limit = limit
+        # (name, type, value, is_array) of each @name in the SQL
+        self.parameters = []
+        self.sql = self._build()
+
+    def _add_parameter(self, value, is_array=False):
+        name = 'p{}'.format(len(self.parameters))
+        if is_array:
+            values = list(value)
+            if not values:
+                raise ValueError('in and not in need at least one value')
+            value_type = parameter_type(values[0])
+            self.parameters.append((name, value_type, values, True))
+        else:
+            self.parameters.append((name, parameter_type(value), value, False))
+        return '@' + name
+
+    def _condition(self, column, operator, value):
+        operator = operator.lower()
+        if operator not in OPERATORS:
+            raise ValueError('operator must be one of {}'.format(OPERATORS))
+        column = quote_identifier(column)
+        if operator in ['is null', 'is not null']:
+            return '{} {}'.format(column, operator)
+        elif operator in ['in', 'not in']:
+            return '{} {} unnest({})'.format(column, operator, self._add_parameter(value, is_array=True))
+        elif value is None:
+            raise ValueError('None cannot be compared with {}, use is null'.format(operator))
+        return '{} {} {}'.format(column, operator, self._add_parameter(value))
+
+    def _date_range_condition(self, column, operator, value):
+        if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+            return 'DATE({}) {} {}'.format(quote_identifier(column), operator, self._add_parameter(value))
+        return self._condition(column, operator, value)
+
+    def _build(self):
+        selector = ', '.join(quote_identifier(column) for column in self.columns) if self.columns else '*'
+        sql = 'select {} from `{}`'.format(selector, self.table_ref)
+
+        if self.sample is not None:
+            sample = float(self.sample)
+            if not 0 < sample <= 100:
+                raise ValueError('sample must be a percentage between 0 and 100')
+            sql += ' tablesample system ({:g} percent)'.format(sample)
+
+        conditions = [self._condition(*f) for f in self.filters]
+        if self.date_range:
+            column, start, end = self.date_range
+            if start is not None:
+                conditions.append(self._date_range_condition(column, '>=', start))
+            if end is not None:
+                conditions.append(self._date_range_condition(column, '<=', end))
+        if conditions:
+            sql += ' where ' + ' and '.join(conditions)
+
+        if self.limit:
+            sql += ' limit {}'.format(int(self.limit))
+        return sql
+
+    def job_config(self):
+        from google.cloud import bigquery
+
+        job_config = bigquery.QueryJobConfig()
+        job_config.query_parameters = [
+            bigquery.ArrayQueryParameter(name, value_type, value) if is_array
+            else bigquery.ScalarQueryParameter(name, value_type, value)
+            for name, value_type, value, is_array in self.parameters
+        ]
+        return job_config
@@ -0,0 +1,96 @@
+import sys
+
+# Schema fields without the BigQuery client: importing google.cloud.bigquery
+# takes longer than most short-lived jobs run. Tables keep their schema as
+# SchemaFields and only convert it to bigquery.SchemaFields when it is read
+# from BQTable.schema or sent to BigQuery.
+
+
+class SchemaField(object):
+    __slots__ = ['name', 'field_type', 'mode', 'description', 'fields', '_bigquery_field']
+
+    def __init__(self, name, field_type, mode='NULLABLE', description=None, fields=(), bigquery_field=None):
+        self.name = name
+        self.field_type = field_type.upper()
+        self.mode = mode.upper() if mode else 'NULLABLE'
+        self.description = description
+        self.fields = tuple(fields)
+        # the bigquery.SchemaField this field was made from, keeps properties
+        # bqtools does not use (policy tags, precision, ...) for uploads
+        self._bigquery_field = bigquery_field
+
+    def _key(self):
+        return (self.name, self.field_type, self.mode, self.description, self.fields)
+
+    def __eq__(self, other):
+        if _is_bigquery_field(other):
+            other = from_bigquery(other)
+        if not isinstance(other, SchemaField):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return 'SchemaField({!r}, {!r}, {!r}, {!r}, {!r})'.format(*self._key())
+
+
+def _is_bigquery_field(field):
+    # bigquery fields cannot exist before the caller imported google.cloud.bigquery
+    bigquery = sys.modules.get('google.cloud.bigquery')
+    return bigquery is not None and isinstance(field, bigquery.SchemaField)
+
+def from_bigquery(field):
+    return SchemaField(
+        field.name,
+        field.field_type,
+        mode=field.mode,
+        description=field.description,
+        fields=[from_bigquery(f) for f in field.fields],
+        bigquery_field=field
+    )
+
+def to_bigquery(field):
+    if field._bigquery_field is not None:
+        return field._bigquery_field
+    from google.cloud import bigquery
+    return bigquery.SchemaField(
+        field.name,
+        field.field_type,
+        mode=field.mode,
+        description=field.description,
+        fields=[to_bigquery(f) for f in field.fields]
+    )
+
+def to_field(field):
+    if isinstance(field, SchemaField):
+        return field
+    elif _is_bigquery_field(field):
+        return from_bigquery(field)
+    elif isinstance(field, (tuple, list)):
+        if len(field) > 3:
+            # positions beyond mode follow the signature of bigquery.SchemaField
+            from google.cloud import bigquery
+            return from_bigquery(bigquery.SchemaField(*field))
+        return SchemaField(*field)
+    elif isinstance(field, dict):
+        field = dict(field)
+        if field['field_type'].upper() in ['RECORD', 'STRUCT']:
+            if field.get('fields', None):
+                field['fields'] = [to_field(f) for f in field['fields']]
+            else:
+                raise ValueError('fields not specified for field type RECORD')
+        if set(field) - {'name', 'field_type', 'mode', 'description', 'fields'}:
+            from google.cloud import bigquery
+            if 'fields' in field:
+                field['fields'] = [to_bigquery(f) for f in field['fields']]
+            return from_bigquery(bigquery.SchemaField(**field))
+        return SchemaField(**field)
+
+def to_bigquery_schema(schema):
+    return [to_bigquery(field) for field in schema]
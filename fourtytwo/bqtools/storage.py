@@ -0,0 +1,252 @@
+import array
+import collections.abc
+import itertools
+
+
+class Column(collections.abc.Sequence):
+    field_type = None
+
+    def __init__(self, values=()):
+        self._length = 0
+        self._validity = None
+        self._init_buffers()
+        self.extend(values)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            values = self._get_slice(start, stop) if stop > start else []
+            if self._validity is not None:
+                validity = self._validity
+                values = [
+                    value if validity[i >> 3] >> (i & 7) & 1 else None
+                    for i, value in enumerate(values, start)
+                ]
+            return values
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('column index out of range')
+        if not self.is_valid(index):
+            return None
+        return self._get_value(index)
+
+    def __iter__(self):
+        values = self._iter_values()
+        if self._validity is None:
+            return values
+        validity = self._validity
+        return (
+            value if validity[index >> 3] >> (index & 7) & 1 else None
+            for index, value in enumerate(values)
+        )
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, Column)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def is_valid(self, index):
+        return self._validity is None or bool(self._validity[index >> 3] >> (index & 7) & 1)
+
+    def extend(self, values):
+        # values are encoded before any buffer is changed, so a value that
+        # does not fit (OverflowError, TypeError) leaves the column as it was
+        values = values if isinstance(values, list) else list(values)
+        start = self._length
+        self._extend_values(values)
+        self._length += len(values)
+        self._set_nulls(start, values)
+
+    def tolist(self):
+        return list(self)
+
+    def null_mask(self):
+        import numpy as np
+
+        if self._validity is None:
+            return np.zeros(self._length, dtype=bool)
+        bits = np.unpackbits(np.frombuffer(bytes(self._validity), dtype='uint8'), bitorder='little')
+        return bits[:self._length] == 0
+
+    def _set_nulls(self, start, values):
+        # validity bitmap: one bit per row, 1 = value, 0 = null.
+        # it is only allocated once the first null shows up.
+        null_indexes = [index for index, value in enumerate(values, start) if value is None]
+        if self._validity is None and not null_indexes:
+            return
+        n_bytes = (self._length + 7) // 8
+        if self._validity is None:
+            self._validity = bytearray(b'\xff' * n_bytes)
+        else:
+            self._validity.extend(b'\xff' * (n_bytes - len(self._validity)))
+        for index in null_indexes:
+            self._validity[index >> 3] &= ~(1 << (index & 7)) & 0xff
+
+
+class FixedWidthColumn(Column):
+    typecode = None
+    null_value = 0
+
+    def _init_buffers(self):
+        self._values = array.array(self.typecode)
+
+    def _extend_values(self, values):
+        null_value = self.null_value
+        self._values.extend(array.array(
+            self.typecode, [null_value if v is None else v for v in values]
+        ))
+
+    def _get_value(self, index):
+        return self._values[index]
+
+    def _get_slice(self, start, stop):
+        return self._values[start:stop].tolist()
+
+    def _iter_values(self):
+        return iter(self._values)
+
+    def to_numpy(self):
+        import numpy as np
+
+        values = np.array(self._values, dtype=self.typecode)
+        if self._validity is None:
+            return values
+        # nulls become NaN, like pandas does for python lists with None
+        values = values.astype('float64')
+        values[self.null_mask()] = np.nan
+        return values
+
+    def to_numpy_masked(self):
+        # the values buffer (nulls are null_value) and the null mask, or None without nulls
+        import numpy as np
+
+        values = np.array(self._values, dtype=self.typecode)
+        return values, self.null_mask() if self._validity is not None else None
+
+    @classmethod
+    def from_numpy(cls, values, null_mask=None):
+        # one buffer copy, values are not converted one by one
+        import numpy as np
+
+        column = cls()
+        column._values.frombytes(np.ascontiguousarray(values, dtype=cls.typecode).tobytes())
+        column._length = len(column._values)
+        if null_mask is not None and null_mask.any():
+            column._validity = bytearray(np.packbits(~null_mask, bitorder='little').tobytes())
+        return column
+
+
+class IntegerColumn(FixedWidthColumn):
+    field_type = 'INTEGER'
+    typecode = 'q'
+
+
+class FloatColumn(FixedWidthColumn):
+    field_type = 'FLOAT'
+    typecode = 'd'
+    null_value = 0.0
+
+
+class BooleanColumn(FixedWidthColumn):
+    field_type = 'BOOLEAN'
+    typecode = 'b'
+
+    def _get_value(self, index):
+        return bool(self._values[index])
+
+    def _get_slice(self, start, stop):
+        return list(map(bool, self._values[start:stop]))
+
+    def _iter_values(self):
+        return map(bool, self._values)
+
+    def to_numpy(self):
+        import numpy as np
+
+        if self._validity is None:
+            return np.array(self._values, dtype='int8').astype(bool)
+        return np.array(self.tolist(), dtype=object)
+
+
+class StringColumn(Column):
+    # offsets + bytes layout: value i is buffer[offsets[i]:offsets[i + 1]]
+    field_type = 'STRING'
+
+    def _init_buffers(self):
+        self._offsets = array.array('q', [0])
+        self._buffer = bytearray()
+
+    def _encode(self, value):
+        return value.encode('utf8')
+
+    def _decode(self, value):
+        return value.decode('utf8')
+
+    def _extend_values(self, values):
+        encoded = [b'' if v is None else self._encode(v) for v in values]
+        data = b''.join(encoded)
+        offset = self._offsets[-1]
+        self._offsets.extend(offset + n for n in itertools.accumulate(map(len, encoded)))
+        self._buffer += data
+
+    def _get_value(self, index):
+        return self._decode(self._buffer[self._offsets[index]:self._offsets[index + 1]])
+
+    def _get_slice(self, start, stop):
+        buffer, decode = self._buffer, self._decode
+        offsets = self._offsets[start:stop + 1]
+        return [decode(buffer[a:b]) for a, b in zip(offsets, offsets[1:])]
+
+    def _iter_values(self):
+        buffer, decode, offsets = self._buffer, self._decode, self._offsets
+        return (
+            decode(buffer[start:end])
+            for start, end in zip(offsets, itertools.islice(offsets, 1, None))
+        )
+
+    def to_numpy(self):
+        import numpy as np
+
+        return np.array(self.tolist(), dtype=object)
+
+
+class BytesColumn(StringColumn):
+    field_type = 'BYTES'
+
+    def _encode(self, value):
+        return value
+
+    def _decode(self, value):
+        return bytes(value)
+
+
+COLUMN_TYPES = {
+    'INTEGER': IntegerColumn,
+    'FLOAT': FloatColumn,
+    'BOOLEAN': BooleanColumn,
+    'STRING': StringColumn,
+    'BYTES': BytesColumn,
+}
+
+def make_column(values, field_type, mode='NULLABLE'):
+    column_type = COLUMN_TYPES.get(field_type.upper())
+    if column_type is not None and type(values) is column_type:
+        return values
+    if column_type is None or mode.upper() == 'REPEATED':
+        return values if isinstance(values, list) else list(values)
+    try:
+        return column_type(values)
+    except (OverflowError, TypeError):
+        # e.g. integers outside of int64, keep them as python objects
+        return values if isinstance(values, list) else list(values)
@@ -0,0 +1,371 @@
+import base64
+import contextlib
+import csv
+import datetime
+import gzip
+import io
+import itertools
+import json
+import math
+import time
+import zlib
+
+from fourtytwo.bqtools import instrumentation
+
+# BigQuery load jobs only accept gzip, exports may also use zstd
+COMPRESSION_TYPES = [None, 'gzip']
+EXPORT_COMPRESSION_TYPES = [None, 'gzip', 'zstd']
+
+
+class ChunkStream(io.RawIOBase):
+    # read-only file-like object over an iterable of encoded chunks.
+    # chunks are only encoded when they are read, so a load job can consume
+    # a table without it ever being written to disk.
+    def __init__(self, chunks, compression=None):
+        if compression not in COMPRESSION_TYPES:
+            raise ValueError('compression must be one of {}'.format(COMPRESSION_TYPES))
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+        self._position = 0
+        self._exhausted = False
+        self._compressor = make_compressor(compression)
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # resumable uploads seek to the current position after each chunk
+        if whence == io.SEEK_SET and offset == self._position:
+            return self._position
+        raise io.UnsupportedOperation('ChunkStream can only be read sequentially')
+
+    def _read_chunk(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._exhausted = True
+            return self._compressor.flush() if self._compressor else b''
+        return self._compressor.compress(chunk) if self._compressor else chunk
+
+    def readinto(self, b):
+        size = len(b)
+        while len(self._buffer) < size and not self._exhausted:
+            self._buffer += self._read_chunk()
+        n_bytes = min(size, len(self._buffer))
+        b[:n_bytes] = self._buffer[:n_bytes]
+        del self._buffer[:n_bytes]
+        self._position += n_bytes
+        return n_bytes
+
+    def readall(self):
+        while not self._exhausted:
+            self._buffer += self._read_chunk()
+        data = bytes(self._buffer)
+        self._buffer = bytearray()
+        self._position += len(data)
+        return data
+
+
+def make_compressor(compression):
+    # returns an object with compress() and flush(), or None
+    if compression == 'gzip':
+        return zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('zstandard is required for zstd compression: pip install zstandard')
+        return zstandard.ZstdCompressor().compressobj()
+    elif compression is None:
+        return None
+    raise ValueError('compression must be one of {}'.format(EXPORT_COMPRESSION_TYPES))
+
+
+# like BigQuery, BYTES are base64 in CSV, all other values are written as they are
+_CSV_ENCODERS = {
+    'BYTES': lambda value: base64.b64encode(value).decode('ascii'),
+}
+
+def csv_value_encoder(field):
+    encode_value = _CSV_ENCODERS.get(field.field_type.upper())
+    if encode_value is None or field.mode.upper() == 'REPEATED':
+        return None
+
+    def encode(value):
+        return None if value is None else encode_value(value)
+    return encode
+
+def encode_csv(rows, delimiter=',', encoders=None):
+    # encoders has a value encoder or None per field, see csv_value_encoder
+    if encoders and any(encoders):
+        rows = [
+            [encode(value) if encode else value for encode, value in zip(encoders, row)]
+            for row in rows
+        ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf8')
+
+def csv_chunk_encoder(schema, delimiter=','):
+    encoders = [csv_value_encoder(field) for field in schema]
+
+    def encode(rows):
+        return encode_csv(rows, delimiter=delimiter, encoders=encoders)
+    return encode
+
+def csv_chunks(row_chunks, schema, delimiter=','):
+    encode = csv_chunk_encoder(schema, delimiter=delimiter)
+    for rows in row_chunks:
+        yield encode(rows)
+
+def json_chunk_encoder(schema):
+    encode_row = json_row_encoder(schema)
+
+    def encode(rows):
+        return ''.join([encode_row(row) + '\n' for row in rows]).encode('utf8')
+    return encode
+
+def json_chunks(row_chunks, schema):
+    encode = json_chunk_encoder(schema)
+    for rows in row_chunks:
+        yield encode(rows)
+
+@contextlib.contextmanager
+def open_output(target):
+    # target is a filename or a binary file-like object, e.g. a pipe or a
+    # socket file. file-like objects are not closed.
+    if hasattr(target, 'write'):
+        yield target
+    else:
+        with open(target, 'wb') as f:
+            yield f
+
+def write_chunks(target, row_chunks, encode, compression=None, progress=None):
+    # encodes, compresses and writes one chunk of rows at a time, so only one
+    # chunk is held in memory. returns rows and bytes written and their rates.
+    compressor = make_compressor(compression)
+    start_time = time.time()
+    stats = {'rows': 0, 'bytes': 0}
+
+    def update_stats(n_rows, n_bytes):
+        stats['rows'] += n_rows
+        stats['bytes'] += n_bytes
+        stats['seconds'] = time.time() - start_time
+        stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else None
+        stats['bytes_per_second'] = stats['bytes'] / stats['seconds'] if stats['seconds'] else None
+
+    with open_output(target) as f:
+        for rows in row_chunks:
+            data = encode(rows)
+            if compressor:
+                data = compressor.compress(data)
+            f.write(data)
+            update_stats(len(rows), len(data))
+            if progress:
+                progress(dict(stats))
+        if compressor:
+            data = compressor.flush()
+            f.write(data)
+            update_stats(0, len(data))
+        f.flush()
+    instrumentation.record_time('write_chunks', stats.get('seconds', 0.0),
+                                rows=stats['rows'], bytes=stats['bytes'], compression=compression)
+    return stats
+
+# Schema-aware JSON encoding: one encoder per field is built up front,
+# so values are not introspected row by row.
+
+def _encode_float(value):
+    if math.isnan(value):
+        return 'null'
+    elif math.isinf(value):
+        return '"Infinity"' if value > 0 else '"-Infinity"'
+    return repr(float(value))
+
+def _encode_timestamp(value):
+    if isinstance(value, (int, float)):
+        if math.isnan(value):
+            return 'null'
+        value = datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+    return '"' + value.isoformat(' ') + '"'
+
+_JSON_ENCODERS = {
+    'INTEGER': lambda value: str(int(value)),
+    'FLOAT': _encode_float,
+    'NUMERIC': lambda value: '"' + str(value) + '"',
+    'BOOLEAN': lambda value: 'true' if value else 'false',
+    'STRING': json.encoder.encode_basestring,
+    'BYTES': lambda value: '"' + base64.b64encode(value).decode('ascii') + '"',
+    'DATE': lambda value: '"' + value.isoformat() + '"',
+    'DATETIME': lambda value: '"' + value.isoformat(' ') + '"',
+    'TIME': lambda value: '"' + value.isoformat() + '"',
+    'TIMESTAMP': _encode_timestamp,
+}
+
+def _json_record_encoder(fields):
+    keys = [json.encoder.encode_basestring(field.name) + ':' for field in fields]
+    encoders = [json_value_encoder(field) for field in fields]
+    names = [field.name for field in fields]
+
+    def encode(value):
+        return '{' + ','.join([
+            key + encoder(value.get(name))
+            for key, encoder, name in zip(keys, encoders, names)
+        ]) + '}'
+    return encode
+
+def json_value_encoder(field):
+    field_type = field.field_type.upper()
+    if field_type in ['RECORD', 'STRUCT']:
+        encode_value = _json_record_encoder(field.fields)
+    elif field_type in _JSON_ENCODERS:
+        encode_value = _JSON_ENCODERS[field_type]
+    else:
+        raise NotImplementedError('JSON encoding of {} is not implemented.'.format(field_type))
+
+    def encode(value):
+        return 'null' if value is None else encode_value(value)
+
+    if field.mode.upper() == 'REPEATED':
+        def encode_repeated(value):
+            return '[]' if value is None else '[' + ','.join([encode(v) for v in value]) + ']'
+        return encode_repeated
+    return encode
+
+def json_row_encoder(schema):
+    keys = [json.encoder.encode_basestring(field.name) + ':' for field in schema]
+    encoders = [json_value_encoder(field) for field in schema]
+
+    def encode(row):
+        return '{' + ','.join([
+            key + encoder(value) for key, encoder, value in zip(keys, encoders, row)
+        ]) + '}'
+    return encode
+
+# -- reading
+
+@contextlib.contextmanager
+def open_input(source, compression=None):
+    # source is a filename, a binary file-like object or a text stream.
+    # file-like objects are not closed.
+    if compression not in EXPORT_COMPRESSION_TYPES:
+        raise ValueError('compression must be one of {}'.format(EXPORT_COMPRESSION_TYPES))
+    if isinstance(source, io.TextIOBase) and compression is None:
+        yield source
+        return
+
+    with contextlib.ExitStack() as stack:
+        f = source if hasattr(source, 'read') else stack.enter_context(open(source, 'rb'))
+        if compression == 'gzip':
+            f = stack.enter_context(gzip.GzipFile(fileobj=f))
+        elif compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError('zstandard is required for zstd compression: pip install zstandard')
+            f = stack.enter_context(zstandard.ZstdDecompressor().stream_reader(f, closefd=False))
+        text = io.TextIOWrapper(f, encoding='utf8', newline='')
+        try:
+            yield text
+        finally:
+            text.detach()
+
+def iter_chunks(iterable, chunk_size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def csv_row_chunks(f, delimiter=',', skip_leading_rows=0, chunk_size=10000):
+    reader = csv.reader(f, delimiter=delimiter)
+    return iter_chunks(itertools.islice(reader, skip_leading_rows, None), chunk_size)
+
+def json_row_chunks(f, chunk_size=10000):
+    return iter_chunks((json.loads(line) for line in f if line.strip()), chunk_size)
+
+# Decoding: only values that the conversions cannot recognize from their
+# text form need a decoder, everything else is converted by BQTable.
+
+def _decode_bytes(value):
+    return base64.b64decode(value) if isinstance(value, str) else value
+
+def _decode_csv_timestamp(value):
+    # written as epoch seconds by to_csv
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+_CSV_BOOLEANS = {'true': True, 'false': False, '1': True, '0': False}
+
+def _decode_csv_boolean(value):
+    # true/false as in BigQuery exports, True/False as written by to_csv
+    if isinstance(value, bool):
+        return value
+    try:
+        return _CSV_BOOLEANS[value.lower()]
+    except KeyError:
+        raise ValueError('{!r} is not a CSV boolean'.format(value))
+
+def _json_record_decoder(fields):
+    decoders = [(field.name, json_value_decoder(field)) for field in fields]
+    decoders = [(name, decode) for name, decode in decoders if decode]
+    if not decoders:
+        return None
+
+    def decode(value):
+        if isinstance(value, dict):
+            value = dict(value)
+            for name, decode_value in decoders:
+                if name in value:
+                    value[name] = decode_value(value[name])
+        return value
+    return decode
+
+def _value_decoder(field, decoders):
+    field_type = field.field_type.upper()
+    if field_type in ['RECORD', 'STRUCT']:
+        decode_value = _json_record_decoder(field.fields)
+    else:
+        decode_value = decoders.get(field_type)
+    if decode_value is None:
+        return None
+
+    def decode(value):
+        return None if value is None else decode_value(value)
+
+    if field.mode.upper() == 'REPEATED':
+        def decode_repeated(value):
+            return [decode(v) for v in value] if isinstance(value, list) else value
+        return decode_repeated
+    return decode
+
+def json_value_decoder(field):
+    return _value_decoder(field, {'BYTES': _decode_bytes})
+
+def csv_value_decoder(field):
+    decode_value = _value_decoder(field, {
+        'BYTES': _decode_bytes,
+        'TIMESTAMP': _decode_csv_timestamp,
+        'BOOLEAN': _decode_csv_boolean,
+    })
+
+    # empty fields are NULL in CSV, like in BigQuery
+    def decode(value):
+        if value == '':
+            return None
+        return decode_value(value) if decode_value else value
+    return decode
+
+def decode_columns(columns, schema, value_decoder):
+    decoders = [value_decoder(field) for field in schema]
+    return [
+        [decode(value) for value in column] if decode else column
+        for column, decode in zip(columns, decoders)
+    ]
@@ -0,0 +1,104 @@
+import gzip
+import re
+
+from google.api_core import exceptions
+
+# In-memory stand-ins for the BigQuery client and its jobs, used by the tests
+# and the benchmarks. Not imported by fourtytwo.bqtools itself.
+
+class FakeJob(object):
+    def __init__(self, **properties):
+        self.__dict__.update(properties)
+
+    def result(self, **kwargs):
+        return self
+
+
+class FakeRow(object):
+    def __init__(self, values):
+        self._values = tuple(values)
+
+    def values(self):
+        return self._values
+
+
+class FakeRowIterator(object):
+    def __init__(self, schema, rows, page_size=None):
+        self.schema = schema
+        page_size = page_size or max(len(rows), 1)
+        self.pages = [
+            [FakeRow(row) for row in rows[start:start + page_size]]
+            for start in range(0, len(rows), page_size)
+        ]
+
+
+class FakeQueryJob(object):
+    def __init__(self, schema, rows):
+        self.schema = schema
+        self.rows = rows
+
+    def result(self, page_size=None, **kwargs):
+        return FakeRowIterator(self.schema, self.rows, page_size)
+
+
+class FakeClient(object):
+    # local stand-in for bigquery.Client, keeps uploaded data in memory
+    def __init__(self, read_size=64):
+        self.read_size = read_size
+        self.loads = []
+        self.tables = {}
+        self.copies = []
+        self.deleted = []
+        self.queries = []
+
+    def add_table(self, table_id, schema, rows):
+        self.tables[table_id] = FakeJob(table_id=table_id, schema=schema, rows=rows)
+
+    def get_table(self, table):
+        table_id = '{}.{}.{}'.format(table.project, table.dataset_id, table.table_id)
+        if table_id not in self.tables:
+            raise exceptions.NotFound('Table {} not found'.format(table_id))
+        return self.tables[table_id]
+
+    def query(self, query, job_config=None, **kwargs):
+        # only projections and limits are applied, filters are not evaluated
+        self.queries.append((query, job_config))
+        table = self.tables[re.search(' from `(.+?)`', query).group(1)]
+        schema, rows = table.schema, table.rows
+        selector = re.match('select (.+?) from ', query).group(1)
+        if selector != '*':
+            field_names = [field.name for field in schema]
+            indexes = [field_names.index(name) for name in re.findall('`(.+?)`', selector)]
+            schema = [schema[index] for index in indexes]
+            rows = [[row[index] for index in indexes] for row in rows]
+        limit = re.search(r' limit (\d+)', query)
+        if limit:
+            rows = rows[:int(limit.group(1))]
+        return FakeQueryJob(schema, rows)
+
+    def load_table_from_file(self, file_obj, destination, job_config=None, job_id_prefix=None, **kwargs):
+        # read like a resumable upload: fixed size reads until a short read
+        chunks = []
+        while True:
+            chunk = file_obj.read(self.read_size)
+            chunks.append(chunk)
+            if len(chunk) < self.read_size:
+                break
+        data = b''.join(chunks)
+        if data[:2] == b'\x1f\x8b':
+            data = gzip.decompress(data)
+        job = FakeJob(destination=destination, job_config=job_config, data=data)
+        self.loads.append(job)
+        return job
+
+    def create_table(self, table):
+        self.tables['{}.{}.{}'.format(table.project, table.dataset_id, table.table_id)] = table
+        return table
+
+    def copy_table(self, sources, destination, job_config=None, **kwargs):
+        job = FakeJob(sources=sources, destination=destination, job_config=job_config)
+        self.copies.append(job)
+        return job
+
+    def delete_table(self, table, not_found_ok=False, **kwargs):
+        self.deleted.append(table)
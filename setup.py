@@ -19,7 +19,7 @@ setup(
     url = 'https://github.com/42DIGITAL/bqtools',
     packages = find_packages(exclude=['tests']),
     install_requires=DEPENDENCIES,
-    extras_require={'test': ['pytest']},
+    extras_require={'test': ['pytest'], 'parquet': ['pyarrow'], 'zstd': ['zstandard']},
     classifiers=[
         'Development Status :: 4 - Beta',
         'Topic :: Database',
@@ -0,0 +1,86 @@
+import datetime
+import decimal
+import io
+import math
+
+import pytest
+from google.cloud import bigquery
+
+from fourtytwo import bqtools
+from fourtytwo.bqtools.testing import FakeClient
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+SCHEMA = [
+    {'name': 'number', 'field_type': 'INTEGER', 'mode': 'REQUIRED'},
+    {'name': 'decimal', 'field_type': 'FLOAT'},
+    {'name': 'numeric', 'field_type': 'NUMERIC'},
+    {'name': 'flag', 'field_type': 'BOOLEAN'},
+    {'name': 'text', 'field_type': 'STRING'},
+    {'name': 'raw', 'field_type': 'BYTES'},
+    {'name': 'date', 'field_type': 'DATE'},
+    {'name': 'datetime', 'field_type': 'DATETIME'},
+    {'name': 'time', 'field_type': 'TIME'},
+    {'name': 'timestamp', 'field_type': 'TIMESTAMP'},
+    {'name': 'tags', 'field_type': 'STRING', 'mode': 'REPEATED'},
+    {'name': 'struct', 'field_type': 'RECORD', 'mode': 'REPEATED', 'fields': [
+        {'name': 'number', 'field_type': 'INTEGER'},
+        {'name': 'inner', 'field_type': 'RECORD', 'fields': [
+            {'name': 'timestamp', 'field_type': 'TIMESTAMP'}]}]},
+]
+
+def make_table(storage='list'):
+    rows = [
+        [
+            1, 0.5, decimal.Decimal('1.25'), True, 'ü', b'\x00',
+            datetime.date(2020, 1, 1), datetime.datetime(2020, 1, 1, 10, 30),
+            datetime.time(10, 1, 2, 3), 1577836800.5, ['a', 'b'],
+            [{'number': 1, 'inner': {'timestamp': 1577836800.0}}, {'number': None, 'inner': None}],
+        ],
+        [2, None, None, None, None, None, None, None, None, None, None, None],
+    ]
+    table = bqtools.BQTable(schema=SCHEMA, storage=storage)
+    table.append(rows)
+    return table
+
+def assert_rows_equal(rows, expected):
+    # FLOAT nulls are NaN
+    assert math.isnan(rows[1].pop(1)) and math.isnan(expected[1].pop(1))
+    assert rows == expected
+
+def test_arrow_schema_mapping():
+    arrow_table = make_table().to_arrow()
+    assert arrow_table.schema.field('number').type == pa.int64()
+    assert not arrow_table.schema.field('number').nullable
+    assert arrow_table.schema.field('numeric').type == pa.decimal128(38, 9)
+    assert arrow_table.schema.field('timestamp').type == pa.timestamp('us', tz='UTC')
+    assert arrow_table.schema.field('datetime').type == pa.timestamp('us')
+    assert arrow_table.schema.field('tags').type == pa.list_(pa.field('item', pa.string(), nullable=False))
+    assert pa.types.is_struct(arrow_table.schema.field('struct').type.value_type)
+
+    table = bqtools.from_arrow(arrow_table)
+    assert table.schema == make_table().schema
+
+def test_arrow_roundtrip():
+    for storage in ['list', 'typed']:
+        table = make_table(storage)
+        arrow_table = table.to_arrow()
+        assert arrow_table.column('decimal').null_count == 1
+        assert arrow_table.column('number').to_pylist() == [1, 2]
+        assert_rows_equal(bqtools.from_arrow(arrow_table).rows(), table.rows())
+
+def test_parquet_roundtrip(tmpdir):
+    table = make_table()
+    filename = str(tmpdir.join('table.parquet'))
+    table.to_parquet(filename)
+    assert_rows_equal(bqtools.from_parquet(filename).rows(), table.rows())
+    assert bqtools.from_parquet(filename, columns=['text']).data == [['ü', None]]
+
+def test_to_bq_parquet():
+    client = FakeClient()
+    table = make_table()
+    table.to_bq('project.dataset.table', client=client, source_format='parquet')
+    job = client.loads[0]
+    assert job.job_config.source_format == bigquery.SourceFormat.PARQUET
+    assert pq.read_table(io.BytesIO(job.data)).num_rows == 2
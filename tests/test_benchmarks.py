@@ -0,0 +1,15 @@
+from benchmarks import generators
+from benchmarks import run
+
+def test_benchmarks_generators():
+    for kind in generators.KINDS:
+        rows = generators.make_rows(kind, 20)
+        assert rows == generators.make_rows(kind, 20)
+        assert len(generators.make_columns(kind, 20)) == len(generators.make_schema(kind))
+
+def test_benchmarks_run():
+    results = run.run(generators.KINDS, [20], repeat=1)
+    names = set(result['benchmark'] for result in results)
+    assert {'convert.RECORD.REPEATED', 'append', 'to_df', 'load', 'to_csv', 'to_bq', 'read_bq'} <= names
+    comparison = run.compare(results, {'results': results})
+    assert all(result['ratio'] == 1 for result in comparison)
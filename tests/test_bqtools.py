@@ -1,6 +1,28 @@
+import concurrent.futures
+import csv
+import decimal
+import gzip
+import io
+import json
+import math
+
+import pytest
+
 from fourtytwo import bqtools
+from fourtytwo.bqtools.testing import FakeClient
 from google.cloud import bigquery
 
+@pytest.fixture
+def converted_columns(monkeypatch):
+    # (field_type, length) of each column conversions.convert is called with
+    calls = []
+    convert = bqtools.conversions.convert
+    def counting_convert(column, field_type, *args, **kwargs):
+        calls.append((field_type, len(column)))
+        return convert(column, field_type, *args, **kwargs)
+    monkeypatch.setattr(bqtools.conversions, 'convert', counting_convert)
+    return calls
+
 def test_bqtools_construct_columns():
     schema = [
         {'name': 'number', 'field_type': 'INTEGER'},
@@ -119,4 +141,401 @@ def test_bqtools_set_schema():
 #     assert len(table.schema) == 3
 #     assert len(table.data) == 3
 #     assert len(table.rows()) == 4
-    
\ No newline at end of file
+    
+def test_bqtools_pivot():
+    schema = [bigquery.SchemaField('number', 'INTEGER'), bigquery.SchemaField('text', 'STRING')]
+    short_row = [3]
+    rows = [(1, 'a'), [2, 'b', 'extra'], short_row, {'text': 'd'}]
+    columns = bqtools._rows_to_columns(rows, schema)
+    assert columns == [[1, 2, 3, None], ['a', 'b', None, 'd']]
+    assert short_row == [3]
+    assert bqtools._rows_to_columns([{'number': 1, 'text': 'a'}, {'number': 2}], schema) == [[1, 2], ['a', None]]
+    assert bqtools._rows_to_columns([], schema) == [[], []]
+
+    assert bqtools._columns_to_rows(columns, schema, n=2) == [[1, 'a'], [2, 'b']]
+    assert bqtools._columns_to_rows(columns, schema, row_type='dict')[3] == {'number': None, 'text': 'd'}
+
+def test_bqtools_iter_rows():
+    schema = [{'name': 'number', 'field_type': 'INTEGER'}]
+    table = bqtools.BQTable(schema=schema, data=[[1, 2, 3]], storage='typed')
+    rows = table.iter_rows(row_type='dict')
+    assert next(rows) == {'number': 1}
+    assert list(rows) == [{'number': 2}, {'number': 3}]
+    assert list(table.iter_rows(n=2)) == table.rows(n=2) == [[1], [2]]
+
+def test_bqtools_append_incremental(converted_columns):
+    schema = [
+        {'name': 'number', 'field_type': 'INTEGER'},
+        {'name': 'text', 'field_type': 'STRING'},
+    ]
+    table = bqtools.BQTable(schema=schema, data=[[1, 2], ['a', 'b']])
+    del converted_columns[:]
+
+    table.append([['3', 'c']])
+    table.append([{'number': 4.0, 'text': 'd'}])
+    assert converted_columns == [('INTEGER', 1), ('STRING', 1)] * 2
+    assert table.data == [[1, 2, 3, 4], ['a', 'b', 'c', 'd']]
+
+def test_bqtools_typed_storage(tmpdir):
+    schema = [
+        {'name': 'number', 'field_type': 'INTEGER'},
+        {'name': 'text', 'field_type': 'STRING'},
+        {'name': 'decimal', 'field_type': 'FLOAT'},
+    ]
+    table = bqtools.BQTable(schema=schema, data=[[1, None], ['a', None], [1.5, 2.5]], storage='typed')
+    table.append([[3, 'c', 3.5]])
+    assert isinstance(table.data[0], bqtools.storage.IntegerColumn)
+    assert table.data == [[1, None, 3], ['a', None, 'c'], [1.5, 2.5, 3.5]]
+    assert table.rows(n=1) == [[1, 'a', 1.5]]
+    assert list(table.to_df()['decimal']) == [1.5, 2.5, 3.5]
+
+    filename = str(tmpdir.join('table.bqt'))
+    table.save(filename)
+    loaded = bqtools.load(filename)
+    assert isinstance(loaded.data[1], bqtools.storage.StringColumn)
+    assert loaded == table
+
+    # values that do not fit the typed buffers turn the column into a list
+    table = bqtools.BQTable(schema=[schema[1], schema[0]], data=[['a'], [1]], storage='typed')
+    table.append([['y', 2**70]])
+    assert table.data == [['a', 'y'], [1, 2**70]]
+    assert isinstance(table.data[0], bqtools.storage.StringColumn) and isinstance(table.data[1], list)
+
+def test_bqtools_lazy(converted_columns):
+    schema = [
+        {'name': 'number', 'field_type': 'INTEGER'},
+        {'name': 'text', 'field_type': 'STRING'},
+    ]
+    table = bqtools.BQTable(schema=schema, data=[['1', '2'], ['a', 'b']], lazy=True)
+    table.schema = [table.schema[1], table.schema[0], {'name': 'flag', 'field_type': 'BOOLEAN'}]
+    table.rename({'text': 'letter'})
+    table.append([['c', 3, True]])
+    # only the null value of the new column and the appended row of that column
+    assert converted_columns == [('BOOLEAN', 1), ('BOOLEAN', 1)]
+
+    assert table.column('number') == [1, 2, 3]
+    assert converted_columns[2:] == [('INTEGER', 3)]
+    assert table.data == [['a', 'b', 'c'], [1, 2, 3], [None, None, True]]
+    assert converted_columns[2:] == [('INTEGER', 3), ('STRING', 3)]
+
+def test_bqtools_schema_evolution(converted_columns):
+    schema = [
+        {'name': 'number', 'field_type': 'INTEGER'},
+        {'name': 'text', 'field_type': 'STRING'},
+    ]
+    table = bqtools.BQTable(schema=schema, data=[[1, 2], ['1.5', None]], storage='typed')
+    del converted_columns[:]
+
+    table.rename({'number': 'id'})
+    table.schema = [
+        {'name': 'tags', 'field_type': 'STRING', 'mode': 'REPEATED'},
+        {'name': 'text', 'field_type': 'STRING'},
+        {'name': 'id', 'field_type': 'INTEGER'},
+        {'name': 'decimal', 'field_type': 'FLOAT'},
+    ]
+    assert converted_columns == [('FLOAT', 1)]
+    assert isinstance(table.data[3], bqtools.storage.FloatColumn)
+
+    table.schema = [{'name': 'text', 'field_type': 'FLOAT'}, {'name': 'id', 'field_type': 'INTEGER'}]
+    assert converted_columns == [('FLOAT', 1), ('FLOAT', 2)]
+    assert table.data[0][0] == 1.5 and table.data[1] == [1, 2]
+    with pytest.raises(ValueError):
+        table.rename({'number': 'id'})
+
+def test_bqtools_executor():
+    schema = [
+        {'name': 'number', 'field_type': 'INTEGER'},
+        {'name': 'text', 'field_type': 'STRING'},
+    ]
+    data = [['1', 2, None], ['a', None, 3]]
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        table = bqtools.BQTable(schema=schema, data=data, executor=executor)
+        table.append([['4', 'd']])
+        table.schema = [{'name': 'number', 'field_type': 'FLOAT'}]
+    assert table.data[0][:2] == [1.0, 2.0] and table.data[0][3] == 4.0
+    assert math.isnan(table.data[0][2])
+
+def test_bqtools_lazy_validate():
+    schema = [{'name': 'number', 'field_type': 'INTEGER', 'mode': 'REQUIRED'}]
+    table = bqtools.BQTable(schema=schema, data=[[1, None]], lazy=True)
+    with pytest.raises(ValueError):
+        table.validate()
+    table.schema = [{'name': 'number', 'field_type': 'INTEGER'}]
+    table.validate()
+    assert table.data == [[1, None]]
+
+    # appends go to copies of the columns
+    column = ['1']
+    table = bqtools.BQTable(schema=schema, data=[column], lazy=True)
+    table.append([['2']])
+    assert column == ['1']
+
+    # typed columns whose type changed take raw values again
+    table = bqtools.BQTable(schema=schema, data=[['1', '2']], lazy=True, storage='typed')
+    table.validate()
+    table.schema = [{'name': 'number', 'field_type': 'STRING'}]
+    table.append([['x']])
+    assert table.data == [['1', '2', 'x']]
+
+def test_bqtools_to_bq_stream():
+    schema = [
+        {'name': 'number', 'field_type': 'INTEGER'},
+        {'name': 'text', 'field_type': 'STRING'},
+    ]
+    table = bqtools.BQTable(schema=schema, data=[list(range(100)), ['a,b'] * 100])
+    for compression in [None, 'gzip']:
+        client = FakeClient()
+        table.to_bq('project.dataset.table', client=client, compression=compression, chunk_size=7)
+        job = client.loads[0]
+        assert job.destination.table_id == 'table'
+        assert job.job_config.write_disposition == 'WRITE_APPEND'
+        lines = job.data.decode('utf8').splitlines()
+        assert len(lines) == 100
+        assert lines[99] == '99,"a,b"'
+
+def test_bqtools_to_bq_parallel():
+    schema = [{'name': 'number', 'field_type': 'INTEGER'}]
+    table = bqtools.BQTable(schema=schema, data=[list(range(100))])
+    client = FakeClient()
+    progress = []
+    job = table.to_bq('project.dataset.table', client=client, mode='overwrite',
+                       load_chunk_size=30, max_workers=3, progress=progress.append)
+
+    assert len(client.loads) == 4
+    assert sorted(stats['rows'] for stats in progress) == [10, 30, 30, 30]
+    assert sorted(id(stats['job']) for stats in progress) == sorted(id(job) for job in client.loads)
+    numbers = sorted(int(line) for job in client.loads for line in job.data.decode('utf8').split())
+    assert numbers == list(range(100))
+
+    staging_ref = client.loads[0].destination
+    assert staging_ref.table_id.startswith('table_staging_')
+    assert all(job.job_config.write_disposition == 'WRITE_APPEND' for job in client.loads)
+    assert client.copies[0].sources == staging_ref
+    assert client.copies[0].job_config.write_disposition == 'WRITE_TRUNCATE'
+    assert client.deleted == [staging_ref]
+    assert job is client.copies[0]
+
+    # the staging table is partitioned and clustered like the destination
+    client = FakeClient()
+    destination = bigquery.Table('project.dataset.table', schema=table.schema)
+    destination.time_partitioning = bigquery.TimePartitioning(field='created')
+    destination.clustering_fields = ['number']
+    client.create_table(destination)
+    table.to_bq('project.dataset.table', client=client, mode='overwrite', load_chunk_size=30)
+    staging_table = client.tables['project.dataset.' + client.copies[0].sources.table_id]
+    assert staging_table.time_partitioning.field == 'created'
+    assert staging_table.range_partitioning is None
+    assert staging_table.clustering_fields == ['number']
+
+    client = FakeClient()
+    destination = bigquery.Table('project.dataset.table', schema=table.schema)
+    destination.range_partitioning = bigquery.RangePartitioning(
+        field='number', range_=bigquery.PartitionRange(start=0, end=100, interval=10))
+    client.create_table(destination)
+    table.to_bq('project.dataset.table', client=client, mode='overwrite', load_chunk_size=30)
+    staging_table = client.tables['project.dataset.' + client.copies[0].sources.table_id]
+    assert staging_table.range_partitioning.range_.interval == 10
+    assert staging_table.time_partitioning is None
+
+def test_bqtools_to_json(tmpdir):
+    schema = [
+        {'name': 'number', 'field_type': 'NUMERIC'},
+        {'name': 'time', 'field_type': 'DATETIME'},
+        {'name': 'timestamp', 'field_type': 'TIMESTAMP'},
+        {'name': 'decimal', 'field_type': 'FLOAT'},
+        {'name': 'tags', 'field_type': 'STRING', 'mode': 'REPEATED'},
+        {'name': 'struct', 'field_type': 'RECORD', 'fields': [
+            {'name': 'raw', 'field_type': 'BYTES'},
+            {'name': 'flag', 'field_type': 'BOOLEAN'}]},
+    ]
+    rows = [
+        ['1.50', '2020-01-01 10:00:00', 0, None, ['a', '"b"'], {'raw': b'\x00', 'flag': True}],
+    ]
+    table = bqtools.BQTable(schema=schema)
+    table.append(rows)
+    filename = str(tmpdir.join('table.json'))
+    table.to_json(filename)
+    with open(filename) as json_file:
+        lines = [json.loads(line) for line in json_file]
+    assert lines == [{
+        'number': '1.50',
+        'time': '2020-01-01 10:00:00',
+        'timestamp': '1970-01-01 00:00:00+00:00',
+        'decimal': None,
+        'tags': ['a', '"b"'],
+        'struct': {'raw': 'AA==', 'flag': True},
+    }]
+
+    client = FakeClient()
+    table.to_bq('project.dataset.table', client=client)
+    assert client.loads[0].job_config.source_format == bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
+    assert json.loads(client.loads[0].data) == lines[0]
+
+def test_bqtools_export_streaming(tmpdir):
+    schema = [
+        {'name': 'number', 'field_type': 'INTEGER'},
+        {'name': 'text', 'field_type': 'STRING'},
+    ]
+    table = bqtools.BQTable(schema=schema, data=[list(range(5)), ['a', 'b,c', None, 'd', 'e']])
+
+    progress = []
+    buffer = io.BytesIO()
+    stats = table.to_csv(buffer, compression='gzip', chunk_size=2, progress=progress.append)
+    assert gzip.decompress(buffer.getvalue()) == b'0,a\r\n1,"b,c"\r\n2,\r\n3,d\r\n4,e\r\n'
+    assert [p['rows'] for p in progress] == [2, 4, 5]
+    assert stats['rows'] == 5 and stats['bytes'] == len(buffer.getvalue())
+
+    filename = str(tmpdir.join('table.csv'))
+    table.to_csv(filename, delimiter=';')
+    with open(filename, newline='') as csv_file:
+        assert list(csv.reader(csv_file, delimiter=';'))[1] == ['1', 'b,c']
+
+    buffer = io.BytesIO()
+    table.to_json(buffer, chunk_size=3)
+    assert [json.loads(line)['number'] for line in buffer.getvalue().splitlines()] == list(range(5))
+    with pytest.raises(ValueError):
+        table.to_json(io.BytesIO(), compression='bz2')
+
+def test_bqtools_export_zstd():
+    zstandard = pytest.importorskip('zstandard')
+    table = bqtools.BQTable(schema=[{'name': 'number', 'field_type': 'INTEGER'}], data=[[1, 2]])
+    buffer = io.BytesIO()
+    table.to_csv(buffer, compression='zstd')
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(buffer.getvalue()) == b'1\r\n2\r\n'
+
+def test_bqtools_read_json():
+    schema = [
+        {'name': 'number', 'field_type': 'NUMERIC'},
+        {'name': 'timestamp', 'field_type': 'TIMESTAMP'},
+        {'name': 'raw', 'field_type': 'BYTES'},
+        {'name': 'tags', 'field_type': 'STRING', 'mode': 'REPEATED'},
+        {'name': 'struct', 'field_type': 'RECORD', 'mode': 'REPEATED', 'fields': [
+            {'name': 'raw', 'field_type': 'BYTES'},
+            {'name': 'flag', 'field_type': 'BOOLEAN'}]},
+    ]
+    rows = [
+        ['1.50', 1.5, b'\x00\xff', ['a', 'b'], [{'raw': b'\x01', 'flag': True}]],
+        [None, None, None, [], []],
+        ['2', 0, b'', ['c'], [{'raw': None, 'flag': False}, {'raw': b'x', 'flag': None}]],
+    ]
+    table = bqtools.BQTable(schema=schema)
+    table.append(rows)
+    for compression in [None, 'gzip']:
+        buffer = io.BytesIO()
+        table.to_json(buffer, compression=compression)
+        buffer.seek(0)
+        assert bqtools.read_json(buffer, schema, compression=compression, chunk_size=2) == table
+
+def test_bqtools_read_csv(tmpdir):
+    schema = [
+        {'name': 'number', 'field_type': 'INTEGER'},
+        {'name': 'text', 'field_type': 'STRING'},
+        {'name': 'timestamp', 'field_type': 'TIMESTAMP'},
+        {'name': 'flag', 'field_type': 'BOOLEAN'},
+        {'name': 'raw', 'field_type': 'BYTES'},
+    ]
+    table = bqtools.BQTable(schema=schema, data=[
+        [1, 2, None], ['a', 'b,"c"', 'd'], [1577836800.5, None, 0], [True, False, None],
+        [b'\x00,\n', None, b'xyz']
+    ], storage='typed')
+    filename = str(tmpdir.join('table.csv.gz'))
+    table.to_csv(filename, compression='gzip')
+    with gzip.open(filename, 'rt') as f:
+        assert next(csv.reader(f))[4] == 'ACwK'
+    loaded = bqtools.read_csv(filename, schema, compression='gzip', chunk_size=2, storage='typed')
+    assert loaded == table
+    assert isinstance(loaded.data[0], bqtools.storage.IntegerColumn)
+
+    csv_file = io.StringIO('number;text\n1;x\n2\n')
+    loaded = bqtools.read_csv(csv_file, schema, delimiter=';', skip_leading_rows=1)
+    assert loaded.rows() == [[1, 'x', None, None, None], [2, None, None, None, None]]
+
+    # booleans as in BigQuery exports
+    csv_file = io.StringIO('flag\ntrue\nfalse\nFALSE\n0\n1\n\n')
+    loaded = bqtools.read_csv(csv_file, [schema[3]], skip_leading_rows=1)
+    assert loaded.data == [[True, False, False, False, True, None]]
+    with pytest.raises(ValueError):
+        bqtools.read_csv(io.StringIO('yes\n'), [schema[3]])
+
+def test_bqtools_read_bq_pages():
+    schema = [bigquery.SchemaField('number', 'INTEGER'), bigquery.SchemaField('text', 'STRING')]
+    client = FakeClient()
+    client.add_table('project.dataset.table', schema, [[n, str(n)] for n in range(25)])
+    bqtools.cache.schema_cache.invalidate()
+
+    table = bqtools.read_bq('project.dataset.table', client=client, limit=None, page_size=10)
+    assert table.data == [list(range(25)), [str(n) for n in range(25)]]
+
+    chunks = list(bqtools.read_bq_chunks('project.dataset.table', client=client, page_size=10))
+    assert [len(chunk.rows()) for chunk in chunks] == [10, 10, 5]
+    assert chunks[2].rows(n=1) == [[20, '20']]
+    assert bqtools.read_bq('project.dataset.table', client=client).rows(row_type='dict')[9] == {'number': 9, 'text': '9'}
+
+def test_bqtools_read_bq_query():
+    schema = [bigquery.SchemaField('number', 'INTEGER'), bigquery.SchemaField('text', 'STRING')]
+    client = FakeClient()
+    client.add_table('project.dataset.table', schema, [[n, str(n)] for n in range(5)])
+    client.get_table = None
+
+    table = bqtools.read_bq(
+        'project.dataset.table', client=client, columns=['text'], limit=None,
+        filters=[('number', '>', 2)], sample=50
+    )
+    assert table.schema == [bigquery.SchemaField('text', 'STRING')]
+    assert table.data == [[str(n) for n in range(5)]]
+    sql, job_config = client.queries[-1]
+    assert sql == 'select `text` from `project.dataset.table` tablesample system (50 percent) where `number` > @p0'
+    assert job_config.query_parameters == [bigquery.ScalarQueryParameter('p0', 'INT64', 2)]
+
+def test_bqtools_to_df_dtypes():
+    schema = [
+        {'name': 'number', 'field_type': 'INTEGER'},
+        {'name': 'flag', 'field_type': 'BOOLEAN'},
+        {'name': 'text', 'field_type': 'STRING'},
+        {'name': 'created', 'field_type': 'TIMESTAMP'},
+        {'name': 'updated', 'field_type': 'DATETIME'},
+        {'name': 'amount', 'field_type': 'NUMERIC'},
+        {'name': 'tags', 'field_type': 'STRING', 'mode': 'REPEATED'},
+    ]
+    data = [
+        [2**60, None], [True, None], ['a', None], [1577836800.5, None],
+        ['2020-01-01 10:00:00', None], ['1.5', None], [['a', 'b'], []],
+    ]
+    for storage in bqtools.STORAGE_TYPES:
+        df = bqtools.BQTable(schema=schema, data=data, storage=storage).to_df()
+        assert [str(dtype) for dtype in df.dtypes] == [
+            'Int64', 'boolean', 'string', 'datetime64[us, UTC]', 'datetime64[us]', 'object', 'object'
+        ]
+        assert df['number'][0] == 2**60 and df['number'].isna()[1]
+        assert df['created'][0].isoformat() == '2020-01-01T00:00:00.500000+00:00'
+        assert df['tags'][0] == ['a', 'b']
+
+    # values with an offset become naive UTC
+    table = bqtools.BQTable(schema=[schema[4]], data=[['2020-01-01T00:00:00+02:00', '2020-01-01 10:00:00', None]])
+    assert [str(value) for value in table.to_df()['updated']] == ['2019-12-31 22:00:00', '2020-01-01 10:00:00', 'NaT']
+
+def test_bqtools_from_df():
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame({
+        'number': pd.array([1, None, 3], dtype='Int64'),
+        'value': [1.5, np.nan, 2.5],
+        'flag': [True, False, True],
+        'text': pd.array(['a', None, 'c'], dtype='string'),
+        'created': pd.to_datetime(['2020-01-01 00:00:01', None, '2020-01-02 00:00:00'], utc=True),
+        'amount': [decimal.Decimal('1.5'), None, decimal.Decimal('2')],
+    })
+    for storage in bqtools.STORAGE_TYPES:
+        table = bqtools.BQTable.from_df(df, storage=storage)
+        assert [(field.name, field.field_type) for field in table.schema] == [
+            ('number', 'INTEGER'), ('value', 'FLOAT'), ('flag', 'BOOLEAN'),
+            ('text', 'STRING'), ('created', 'TIMESTAMP'), ('amount', 'NUMERIC'),
+        ]
+        assert table.rows(n=1) == [[1, 1.5, True, 'a', 1577836801.0, decimal.Decimal('1.5')]]
+        assert table.data[0][1] is None and math.isnan(table.data[1][1])
+        assert table.data[3][1] is None and table.data[4][1] is None
+        assert [str(dtype) for dtype in table.to_df().dtypes] == [
+            'Int64', 'float64', 'boolean', 'string', 'datetime64[us, UTC]', 'object'
+        ]
+    assert isinstance(bqtools.from_df(df, storage='typed').data[0], bqtools.storage.IntegerColumn)
@@ -0,0 +1,51 @@
+from google.cloud import bigquery
+
+from fourtytwo import bqtools
+from fourtytwo.bqtools import cache
+from fourtytwo.bqtools.testing import FakeClient
+
+def test_cache_clients(monkeypatch):
+    created = []
+    class Client(object):
+        def __init__(self):
+            created.append(self)
+        @classmethod
+        def from_service_account_json(cls, credentials):
+            return cls()
+    monkeypatch.setattr(bigquery, 'Client', Client)
+    cache.clear_clients()
+
+    assert cache.get_client('credentials.json') is cache.get_client('credentials.json')
+    assert cache.get_client() is not cache.get_client('credentials.json')
+    assert len(created) == 2
+    cache.clear_clients()
+
+def test_cache_schema():
+    schema = [bigquery.SchemaField('number', 'INTEGER')]
+    client = FakeClient()
+    client.add_table('project.dataset.table', schema, [[1]])
+    get_table = client.get_table
+    calls = []
+    client.get_table = lambda table: calls.append(table) or get_table(table)
+
+    schema_cache = cache.SchemaCache(ttl=60)
+    assert schema_cache.get(client, 'project.dataset.table') == schema
+    assert schema_cache.get(client, 'project.dataset.table') == schema
+    assert len(calls) == 1
+    schema_cache.invalidate('project.dataset.table')
+    schema_cache.get(client, 'project.dataset.table')
+    assert len(calls) == 2
+    schema_cache.ttl = 0
+    schema_cache.get(client, 'project.dataset.table')
+    assert len(calls) == 3
+
+    cache.schema_cache.invalidate()
+    bqtools.read_bq('project.dataset.table', client=client, schema_only=True)
+    bqtools.read_bq('project.dataset.table', client=client, schema_only=True)
+    assert len(calls) == 4
+    bqtools.BQTable(schema=schema, data=[[2]]).to_bq('project.dataset.table', client=client)
+    bqtools.read_bq('project.dataset.table', client=client, schema_only=True)
+    assert len(calls) == 5
+    # reads take the schema from the query result
+    bqtools.read_bq('project.dataset.table', client=client)
+    assert len(calls) == 5
@@ -0,0 +1,112 @@
+import concurrent.futures
+import datetime
+import decimal
+import math
+
+import pytest
+from google.cloud import bigquery
+
+from fourtytwo import bqtools
+from fourtytwo.bqtools import conversions
+
+def test_conversions_batch_matches_per_value():
+    columns = [
+        ('INTEGER', [1, 2, None, float('nan'), 3.0, True], conversions.to_integer),
+        ('INTEGER', ['3', '-4', ' 5'], conversions.to_integer),
+        ('INTEGER', ['3', '2.0', 'False', ''], conversions.to_integer),
+        ('FLOAT', [1, 2.5, None, False], conversions.to_float),
+        ('FLOAT', ['2.5', '-1', '1e3'], conversions.to_float),
+        ('FLOAT', ['2.5', 'nan', 'False'], conversions.to_float),
+        ('STRING', ['a', 'b\nc', '', 'None', None], conversions.to_string),
+        ('NUMERIC', [decimal.Decimal('1.5'), 2, None], conversions.to_numeric),
+        ('NUMERIC', ['1.5', '-2'], conversions.to_numeric),
+        ('NUMERIC', ['1.5', '', 'None'], conversions.to_numeric),
+        ('BOOLEAN', [True, 0, None, 'False', 'x'], conversions.to_boolean),
+        ('BOOLEAN', ['True', 'False', '0', '', 'x'], conversions.to_boolean),
+        ('BOOLEAN', ['True', 'None'], conversions.to_boolean),
+    ]
+    for field_type, column, to_value in columns:
+        expected = [to_value(value) for value in column]
+        converted = conversions.convert(column, field_type)
+        assert len(converted) == len(expected)
+        for value, expected_value in zip(converted, expected):
+            if isinstance(expected_value, float) and math.isnan(expected_value):
+                assert math.isnan(value)
+            else:
+                assert value == expected_value
+                assert type(value) == type(expected_value)
+
+def test_conversions_batch_repeated():
+    column = [[1, '2'], [], [None, 3.0]]
+    assert conversions.convert(column, 'INTEGER', 'REPEATED') == [[1, 2], [], [None, 3]]
+
+def test_conversions_batch_required():
+    with pytest.raises(ValueError):
+        conversions.convert([1, None], 'INTEGER', 'REQUIRED')
+    with pytest.raises(ValueError):
+        conversions.convert(['a', ''], 'STRING', 'REQUIRED')
+    with pytest.raises(ValueError):
+        conversions.convert(['1.5', 'nan'], 'FLOAT', 'REQUIRED')
+    with pytest.raises(ValueError):
+        conversions.convert(['1', 'x'], 'INTEGER')
+    assert conversions.convert([1, None], 'INTEGER', 'REQUIRED', infer_required=True) == [1, 0]
+    assert conversions.convert([1.5, None], 'FLOAT', 'REQUIRED', infer_required=True) == [1.5, 0.0]
+
+def test_conversions_datetime_parser():
+    column = ['2020-01-01 10:00:00', '2020-01-01 10:00:00', 'Jan 2 2020 11:00', None, '']
+    converted = conversions.convert(column, 'DATETIME')
+    assert converted == [
+        datetime.datetime(2020, 1, 1, 10), datetime.datetime(2020, 1, 1, 10),
+        datetime.datetime(2020, 1, 2, 11), None, None
+    ]
+    assert converted[0] is converted[1]
+    assert conversions.convert(['2020-01-01'], 'DATE') == [datetime.date(2020, 1, 1)]
+    assert conversions.convert(['10:11:12'], 'TIME') == [datetime.time(10, 11, 12)]
+    assert conversions.convert(['1970-01-01T00:00:10+00:00', None], 'TIMESTAMP') == [10.0, None]
+
+def test_conversions_datetime_parser_formats():
+    parser = conversions.DatetimeParser(sample=['2020/01/31 10:00:00'])
+    assert parser.parse('2020/02/01 11:00:00') == datetime.datetime(2020, 2, 1, 11)
+    assert parser.parse('1 Feb 2020') == datetime.datetime(2020, 2, 1)
+
+def test_conversions_record_nested():
+    schema = [{
+        'name': 'outer', 'field_type': 'RECORD', 'mode': 'REPEATED', 'fields': [
+            {'name': 'number', 'field_type': 'INTEGER'},
+            {'name': 'inner', 'field_type': 'RECORD', 'fields': [
+                {'name': 'number', 'field_type': 'INTEGER'},
+                {'name': 'text', 'field_type': 'STRING'}]}]
+    }]
+    column = [
+        [{'number': '1', 'inner': {'number': 2, 'text': 'a'}}, {'number': None}],
+        [],
+        None,
+    ]
+    table = bqtools.BQTable(schema=schema, data=[column])
+    assert table.data[0] == [
+        [{'number': 1, 'inner': {'number': 2, 'text': 'a'}}, {'number': None, 'inner': None}],
+        [],
+        [],
+    ]
+
+def test_conversions_record_nullable():
+    fields = [bigquery.SchemaField('number', 'INTEGER'), bigquery.SchemaField('text', 'STRING')]
+    column = [{'number': 1}, None, {'number': None, 'text': 'b'}]
+    assert conversions.convert(column, 'RECORD', 'NULLABLE', fields) == [
+        {'number': 1, 'text': None}, None, {'number': None, 'text': 'b'}
+    ]
+    with pytest.raises(ValueError):
+        conversions.convert([[{'number': 1}]], 'RECORD', 'NULLABLE', fields)
+
+def test_conversions_executor(monkeypatch):
+    monkeypatch.setattr(conversions, 'SLICE_SIZE', 3)
+    columns = [[str(n) for n in range(10)], ['2020-01-0{}'.format(n % 9 + 1) for n in range(10)]]
+    field_specs = [('INTEGER', 'NULLABLE', ()), ('DATE', 'NULLABLE', ())]
+    expected = conversions.convert_columns(columns, field_specs)
+    assert expected[0] == list(range(10))
+    for executor in [concurrent.futures.ThreadPoolExecutor(4), concurrent.futures.ProcessPoolExecutor(2)]:
+        with executor:
+            assert conversions.convert_columns(columns, field_specs, executor=executor) == expected
+            assert conversions.convert(columns[0], 'INTEGER', executor=executor) == expected[0]
+            with pytest.raises(ValueError):
+                conversions.convert([1] * 5 + [None], 'INTEGER', 'REQUIRED', executor=executor)
@@ -0,0 +1,131 @@
+import datetime
+import decimal
+import gzip
+import math
+import pickle
+
+import pytest
+
+from fourtytwo import bqtools
+from fourtytwo.bqtools import fileformat
+
+SCHEMA = [
+    {'name': 'number', 'field_type': 'INTEGER'},
+    {'name': 'decimal', 'field_type': 'FLOAT'},
+    {'name': 'numeric', 'field_type': 'NUMERIC'},
+    {'name': 'flag', 'field_type': 'BOOLEAN'},
+    {'name': 'text', 'field_type': 'STRING'},
+    {'name': 'raw', 'field_type': 'BYTES'},
+    {'name': 'date', 'field_type': 'DATE'},
+    {'name': 'datetime', 'field_type': 'DATETIME'},
+    {'name': 'time', 'field_type': 'TIME'},
+    {'name': 'timestamp', 'field_type': 'TIMESTAMP'},
+    {'name': 'tags', 'field_type': 'STRING', 'mode': 'REPEATED'},
+    {'name': 'struct', 'field_type': 'RECORD', 'mode': 'REPEATED', 'fields': [
+        {'name': 'number', 'field_type': 'INTEGER'},
+        {'name': 'inner', 'field_type': 'RECORD', 'fields': [
+            {'name': 'text', 'field_type': 'STRING'}]}]},
+]
+
+def make_table(n_rows=10):
+    rows = []
+    for n in range(n_rows):
+        rows.append([
+            n, n / 2, decimal.Decimal(n) / 3, n % 2 == 0, 'ü{}'.format(n), bytes([n]),
+            datetime.date(2020, 1, n + 1), datetime.datetime(2020, 1, 1, n, 30),
+            datetime.time(n, 1, 2, 3), 1577836800.5 + n, ['a'] * (n % 3),
+            [{'number': n, 'inner': {'text': str(n)}}, {'number': None, 'inner': None}],
+        ])
+    rows.append([None] * len(SCHEMA))
+    table = bqtools.BQTable(schema=SCHEMA)
+    table.append(rows)
+    return table
+
+def test_fileformat_roundtrip(tmpdir):
+    table = make_table()
+    for compression in ['zlib', None]:
+        filename = str(tmpdir.join('table.bqt'))
+        table.save(filename, row_group_size=4, compression=compression)
+        loaded = bqtools.load(filename)
+        assert loaded.schema == table.schema
+        assert loaded.rows()[:10] == table.rows()[:10]
+        null_row = loaded.rows()[10]
+        assert math.isnan(null_row.pop(1))
+        assert null_row == [None, None, None, None, None, None, None, None, None, [], []]
+
+def test_fileformat_large_integers(tmpdir):
+    # integers outside of int64 are kept in list columns, and saved as decimal strings
+    schema = [SCHEMA[0], {'name': 'ids', 'field_type': 'INTEGER', 'mode': 'REPEATED'}]
+    table = bqtools.BQTable(schema=schema, data=[[1, None, 2**70, -2**64], [[2**63], [], [1], None]])
+    filename = str(tmpdir.join('table.bqt'))
+    for compression in ['zlib', None]:
+        table.save(filename, row_group_size=2, compression=compression)
+        assert bqtools.load(filename) == table
+        assert bqtools.load(filename, storage='typed').data == table.data
+        assert bqtools.load(filename, mmap=True).data == table.data
+
+def test_fileformat_projection_and_row_range(tmpdir):
+    table = make_table()
+    filename = str(tmpdir.join('table.bqt'))
+    table.save(filename, row_group_size=4)
+
+    loaded = bqtools.load(filename, columns=['text', 'number'], rows=(3, 9), workers=2)
+    assert [field.name for field in loaded.schema] == ['text', 'number']
+    assert loaded.data == [['ü{}'.format(n) for n in range(3, 9)], list(range(3, 9))]
+    assert bqtools.load(filename, rows=(20, 30)).rows() == []
+
+def test_fileformat_legacy_pickle(tmpdir):
+    filename = str(tmpdir.join('legacy.bqt'))
+    with gzip.open(filename, 'wb') as f:
+        pickle.dump({
+            'schema': [{'name': 'number', 'field_type': 'INTEGER', 'mode': 'NULLABLE', 'description': None, 'fields': ()}],
+            'data': [[1, 2]],
+        }, f)
+    with pytest.raises(ValueError):
+        bqtools.load(filename)
+    assert bqtools.load(filename, allow_pickle=True).data == [[1, 2]]
+
+def test_fileformat_version(tmpdir):
+    filename = str(tmpdir.join('table.bqt'))
+    make_table().save(filename)
+    with open(filename, 'rb') as f:
+        footer = fileformat.read_footer(f)
+    assert footer['version'] == fileformat.FORMAT_VERSION
+    assert footer['num_rows'] == 11
+
+def test_fileformat_mmap(tmpdir):
+    table = make_table()
+    for compression in ['zlib', None]:
+        filename = str(tmpdir.join('table.bqt'))
+        table.save(filename, row_group_size=4, compression=compression)
+        mapped = bqtools.load(filename, mmap=True)
+        assert all(isinstance(column, fileformat.MappedColumn) for column in mapped.data)
+        assert mapped.rows()[:10] == table.rows()[:10]
+        assert mapped.data[0][-1] is None
+        assert mapped.data[0][3:6] == [3, 4, 5]
+        assert mapped.data[3][5] is False
+        assert list(mapped.data[4])[-2:] == ['ü9', None]
+        assert mapped.to_df()['text'].tolist()[:2] == ['ü0', 'ü1']
+        assert mapped.to_df().equals(table.to_df())
+        # nothing is changed before the error
+        rows = mapped.rows()
+        with pytest.raises(TypeError):
+            mapped.append([[1] + [None] * (len(SCHEMA) - 1)])
+        with pytest.raises(TypeError):
+            mapped.schema = SCHEMA[:2]
+        with pytest.raises(TypeError):
+            mapped.data = table.data
+        assert all(isinstance(column, fileformat.MappedColumn) for column in mapped.data)
+        assert [len(column) for column in mapped.data] == [len(rows)] * len(SCHEMA)
+        assert mapped.rows()[:10] == rows[:10] and mapped.schema == table.schema
+    with pytest.raises(ValueError):
+        bqtools.load(filename, rows=(0, 2), mmap=True)
+
+def test_fileformat_mmap_zero_copy(tmpdir):
+    filename = str(tmpdir.join('table.bqt'))
+    bqtools.BQTable(
+        schema=[{'name': 'number', 'field_type': 'INTEGER'}], data=[list(range(10))]
+    ).save(filename, row_group_size=4, compression=None)
+    column = bqtools.load(filename, mmap=True).data[0]
+    assert column.to_numpy().tolist() == list(range(10))
+    assert all(isinstance(group, fileformat._FixedWidthView) for group in column._groups.values())
@@ -0,0 +1,65 @@
+import datetime
+import decimal
+
+import pytest
+from google.cloud import bigquery
+
+from fourtytwo import bqtools
+from fourtytwo.bqtools import inference
+
+def test_inference_rows():
+    rows = [
+        {'id': 1, 'price': 1, 'amount': decimal.Decimal('1.5'), 'created': '2020-01-01', 'tags': ['a'],
+         'user': {'name': 'a', 'age': '20'}, 'raw': b'\x00'},
+        {'id': 2, 'price': 2.5, 'created': '2020-01-02 10:00:00', 'tags': [],
+         'user': {'name': 'b'}, 'raw': None, 'flag': 'True'},
+        {'id': 3, 'price': None, 'amount': 2, 'created': datetime.datetime(2020, 1, 3, tzinfo=datetime.timezone.utc),
+         'tags': None, 'user': None, 'raw': b'', 'flag': 'False'},
+    ]
+    schema = bqtools.infer_schema(rows, required=True)
+    assert schema == [
+        bigquery.SchemaField('id', 'INTEGER', mode='REQUIRED'),
+        bigquery.SchemaField('price', 'FLOAT'),
+        bigquery.SchemaField('amount', 'NUMERIC'),
+        bigquery.SchemaField('created', 'TIMESTAMP', mode='REQUIRED'),
+        bigquery.SchemaField('tags', 'STRING', mode='REPEATED'),
+        bigquery.SchemaField('user', 'RECORD', fields=[
+            bigquery.SchemaField('name', 'STRING', mode='REQUIRED'),
+            bigquery.SchemaField('age', 'INTEGER')]),
+        bigquery.SchemaField('raw', 'BYTES'),
+        bigquery.SchemaField('flag', 'BOOLEAN'),
+    ]
+
+    # tables infer NULLABLE fields, rows with nulls can be appended
+    table = bqtools.BQTable(data=rows)
+    assert [field.mode for field in table.schema] == [
+        'NULLABLE', 'NULLABLE', 'NULLABLE', 'NULLABLE', 'REPEATED', 'NULLABLE', 'NULLABLE', 'NULLABLE']
+    assert table.schema[5].fields[0].mode == 'NULLABLE'
+    assert table.data[5] == [{'name': 'a', 'age': 20}, {'name': 'b', 'age': None}, None]
+    assert table.data[7] == [None, True, False]
+    table.append([{'id': 4}])
+    assert table.rows(row_type='dict')[3]['id'] == 4
+
+def test_inference_columns_and_sampling():
+    columns = [list(range(1000)), ['x'] * 999 + [None]]
+    schema = bqtools.infer_schema(columns, required=True)
+    assert [(f.name, f.field_type, f.mode) for f in schema] == [
+        ('column_0', 'INTEGER', 'REQUIRED'), ('column_1', 'STRING', 'NULLABLE')]
+    assert [f.mode for f in bqtools.infer_schema(columns)] == ['NULLABLE', 'NULLABLE']
+
+    # the null is not sampled, but fields of a partial sample are never REQUIRED
+    schema = bqtools.infer_schema(columns, sample=10, required=True)
+    assert [f.mode for f in schema] == ['NULLABLE', 'NULLABLE']
+    assert inference.sample_indexes(1000, 10) == list(range(0, 1000, 100))
+
+    schema = bqtools.infer_schema({'time': ['10:00:00'], 'number': ['1']}, parse_strings=False)
+    assert [f.field_type for f in schema] == ['STRING', 'STRING']
+    assert bqtools.infer_schema({'time': ['10:00:00']})[0].field_type == 'TIME'
+
+def test_inference_errors():
+    with pytest.raises(ValueError):
+        bqtools.infer_schema([{'a': [1]}, {'a': 1}])
+    with pytest.raises(ValueError):
+        bqtools.infer_schema([{'a': {'b': 1}}, {'a': 1}])
+    assert inference.merge_types(['INTEGER', 'FLOAT', 'NUMERIC']) == 'FLOAT'
+    assert inference.merge_types(['DATE', 'BOOLEAN']) == 'STRING'
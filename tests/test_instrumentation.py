@@ -0,0 +1,56 @@
+import logging
+
+import pytest
+from google.cloud import bigquery
+
+from fourtytwo import bqtools
+from fourtytwo.bqtools import instrumentation
+
+@pytest.fixture(autouse=True)
+def clear_sinks():
+    yield
+    instrumentation.clear_sinks()
+
+def test_instrumentation_stats():
+    schema = [
+        bigquery.SchemaField('number', 'INTEGER'),
+        bigquery.SchemaField('text', 'STRING'),
+    ]
+    stats = instrumentation.add_sink(instrumentation.StatsSink())
+    assert instrumentation.enabled
+
+    table = bqtools.BQTable(schema=schema, data=[[1, 2, 3], ['a', 'b', 'c']])
+    table.append([{'number': 4, 'text': 'd'}])
+    table.rows()
+
+    assert stats.stats['convert.number']['count'] == 2
+    assert stats.stats['convert.number']['rows'] == 4
+    assert stats.stats['convert.text']['seconds'] >= 0
+    assert stats.stats['typecheck']['count'] == 2
+    assert stats.stats['rows_to_columns']['rows'] == 1
+    assert stats.stats['columns_to_rows']['count'] == 1
+
+    instrumentation.clear_sinks()
+    assert not instrumentation.enabled
+    assert instrumentation.timer('anything') is instrumentation.timer('else')
+
+def test_instrumentation_events(tmpdir, caplog):
+    events = []
+    instrumentation.add_sink(events.append)
+    instrumentation.enable_logging()
+
+    table = bqtools.BQTable(schema=[bigquery.SchemaField('number', 'INTEGER')], data=[[1, 2]])
+    filename = str(tmpdir.join('table.bqt'))
+    with caplog.at_level(logging.DEBUG, logger='bqtools'):
+        table.save(filename)
+        bqtools.load(filename)
+
+    assert {'type': 'trace', 'name': 'bqtools.load', 'args': (filename,)} in events
+    timers = [event for event in events if event['type'] == 'timer']
+    assert [event['name'] for event in timers if 'filename' in event['tags']] == ['write_table', 'read_table']
+    assert 'bqtools.load({})'.format(filename) in caplog.text
+
+    with pytest.raises(ValueError):
+        with instrumentation.timer('failing'):
+            raise ValueError()
+    assert events[-1]['tags'] == {'error': 'ValueError'}
@@ -0,0 +1,61 @@
+import datetime
+
+import pytest
+from google.cloud import bigquery
+
+from fourtytwo.bqtools import queries
+
+def test_queries_sql():
+    query = queries.Query(
+        'project.dataset.table',
+        columns=['id', 'record.country'],
+        filters=[('country', 'in', ['DE', 'AT']), ('score', '>=', 0.5), ('deleted', 'is null')],
+        date_range=('created', datetime.date(2020, 1, 1), None),
+        sample=10,
+        limit=100
+    )
+    assert query.sql == (
+        'select `id`, `record`.`country` from `project.dataset.table` tablesample system (10 percent)'
+        ' where `country` in unnest(@p0) and `score` >= @p1 and `deleted` is null'
+        ' and DATE(`created`) >= @p2 limit 100'
+    )
+    assert query.parameters == [
+        ('p0', 'STRING', ['DE', 'AT'], True),
+        ('p1', 'FLOAT64', 0.5, False),
+        ('p2', 'DATE', datetime.date(2020, 1, 1), False),
+    ]
+    job_config = query.job_config()
+    assert job_config.query_parameters[0] == bigquery.ArrayQueryParameter('p0', 'STRING', ['DE', 'AT'])
+    assert job_config.query_parameters[2] == bigquery.ScalarQueryParameter('p2', 'DATE', datetime.date(2020, 1, 1))
+
+    query = queries.Query('project.dataset.table', filters={'flag': True, 'name': None, 'id': (1, 2)})
+    assert query.sql.endswith('where `flag` = @p0 and `name` is null and `id` in unnest(@p1)')
+    assert [parameter[1] for parameter in query.parameters] == ['BOOL', 'INT64']
+
+def test_queries_date_range():
+    # dates also bound TIMESTAMP and DATETIME columns, including the whole end day
+    start, end = datetime.date(2020, 1, 1), datetime.date(2020, 1, 31)
+    query = queries.Query('project.dataset.table', date_range=('_PARTITIONTIME', start, end))
+    assert query.sql.endswith('where DATE(`_PARTITIONTIME`) >= @p0 and DATE(`_PARTITIONTIME`) <= @p1')
+    assert query.parameters == [('p0', 'DATE', start, False), ('p1', 'DATE', end, False)]
+
+    # datetimes are compared with the column as they are
+    end = datetime.datetime(2020, 1, 31, 12, 0)
+    query = queries.Query('project.dataset.table', date_range=('updated', None, end))
+    assert query.sql.endswith('where `updated` <= @p0')
+    assert query.parameters == [('p0', 'DATETIME', end, False)]
+
+def test_queries_validation():
+    with pytest.raises(ValueError):
+        queries.Query('project.dataset.table', columns=['id; drop table x'])
+    with pytest.raises(ValueError):
+        queries.Query('project.dataset.table` where true --')
+    with pytest.raises(ValueError):
+        queries.Query('project.dataset.table', filters=[('id', 'between', 1)])
+    with pytest.raises(ValueError):
+        queries.Query('project.dataset.table', filters=[('id', '=', None)])
+    with pytest.raises(ValueError):
+        queries.Query('project.dataset.table', sample=0)
+    # values never end up in the SQL
+    query = queries.Query('project.dataset.table', filters=[('name', '=', "x' or '1' = '1")])
+    assert "'" not in query.sql
@@ -0,0 +1,50 @@
+import json
+import subprocess
+import sys
+
+from google.cloud import bigquery
+
+from fourtytwo import bqtools
+from fourtytwo.bqtools import schemas
+
+def test_schemas_import_is_lazy(tmpdir):
+    script = '''
+import json, sys
+from fourtytwo import bqtools
+table = bqtools.BQTable(
+    schema=[{'name': 'number', 'field_type': 'INTEGER'}, {'name': 'created', 'field_type': 'TIMESTAMP'}],
+    data=[[1, 2], ['2020-01-01 10:00:00', '2020-01-02 10:00:00']]
+)
+table.append([[3, '2020-01-03 10:00:00']])
+table.rename(columns={'number': 'id'})
+table.save(%r)
+bqtools.load(%r).to_csv(%r)
+print(json.dumps(sorted(sys.modules)))
+''' % ((str(tmpdir.join('table.bqt')),) * 2 + (str(tmpdir.join('table.csv')),))
+    modules = json.loads(subprocess.check_output([sys.executable, '-c', script]).decode('utf8'))
+    for module in ['pandas', 'numpy', 'google.cloud.bigquery', 'google.api_core', 'dateutil']:
+        assert module not in modules
+
+def test_schemas_bigquery_fields():
+    field = bigquery.SchemaField('record', 'RECORD', mode='REPEATED', description='a record', fields=[
+        bigquery.SchemaField('number', 'NUMERIC', precision=10, scale=2),
+    ])
+    converted = schemas.to_field(field)
+    assert isinstance(converted, schemas.SchemaField)
+    assert converted == field and field == converted
+    assert converted.fields[0] == schemas.SchemaField('number', 'NUMERIC')
+    # properties bqtools does not use survive the round trip
+    assert schemas.to_bigquery(converted).fields[0].precision == 10
+
+    assert schemas.to_field(('text', 'string', 'required')) == bigquery.SchemaField('text', 'STRING', 'REQUIRED')
+    assert schemas.to_bigquery(schemas.to_field({'name': 'text', 'field_type': 'STRING'})) == \
+        bigquery.SchemaField('text', 'STRING')
+
+    table = bqtools.BQTable(schema=[field, {'name': 'text', 'field_type': 'STRING'}])
+    assert table.schema[0] is field
+    # the bigquery fields are cached, the list is a copy
+    assert table.schema[1] is table.schema[1]
+    table.schema.append(bigquery.SchemaField('other', 'STRING'))
+    assert len(table.schema) == 2
+    table.rename(columns={'text': 'name'})
+    assert table.schema == [field, bigquery.SchemaField('name', 'STRING')]
@@ -0,0 +1,36 @@
+import pickle
+
+import pytest
+
+from fourtytwo.bqtools import storage
+
+def test_storage_columns():
+    column = storage.IntegerColumn([1, None, 3])
+    column.extend([None, 5])
+    assert column == [1, None, 3, None, 5]
+    assert column[1] is None and column[-1] == 5 and column[1:3] == [None, 3]
+    assert len(column) == 5
+
+    column = storage.StringColumn(['a', None, 'ü'])
+    column.extend(['', 'b'])
+    assert list(column) == ['a', None, 'ü', '', 'b']
+    assert column[2] == 'ü'
+
+    column = storage.BooleanColumn([True, False, None])
+    assert column == [True, False, None]
+    assert pickle.loads(pickle.dumps(column)) == column
+
+    # values that do not fit leave the column as it was
+    column = storage.IntegerColumn([1, None])
+    with pytest.raises(OverflowError):
+        column.extend([None, 2**70])
+    assert column == [1, None] and len(column._values) == 2
+    column = storage.BytesColumn([b'a'])
+    with pytest.raises(TypeError):
+        column.extend([b'b', 'c'])
+    assert column == [b'a'] and column._offsets.tolist() == [0, 1]
+
+def test_storage_make_column():
+    assert isinstance(storage.make_column([1.5], 'FLOAT'), storage.FloatColumn)
+    assert isinstance(storage.make_column([[1]], 'INTEGER', 'REPEATED'), list)
+    assert isinstance(storage.make_column([2**70], 'INTEGER'), list)